@@ -0,0 +1,76 @@
+# bench_delivery.py
+# 对比后台结果送达界面线程的延迟：100ms定时轮询与虚拟事件通知（需要图形界面环境）
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import NotifyingQueue  # noqa: E402
+
+
+def producer(result_queue, count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        time.sleep(rng.uniform(0.01, 0.2))
+        result_queue.put(time.perf_counter())
+
+
+def summarize(latencies):
+    latencies.sort()
+    return (sum(latencies) / len(latencies) * 1000,
+            latencies[len(latencies) // 2] * 1000,
+            latencies[len(latencies) * 99 // 100] * 1000)
+
+
+def run_polling(count):
+    root = tk.Tk()
+    result_queue = queue.Queue()
+    latencies = []
+
+    def check_queue():
+        try:
+            while not result_queue.empty():
+                latencies.append(time.perf_counter() - result_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if len(latencies) >= count:
+            root.quit()
+            return
+        root.after(100, check_queue)
+
+    root.after(100, check_queue)
+    threading.Thread(target=producer, args=(result_queue, count), daemon=True).start()
+    root.mainloop()
+    root.destroy()
+    return summarize(latencies)
+
+
+def run_event(count):
+    root = tk.Tk()
+    result_queue = NotifyingQueue(lambda: root.event_generate("<<ResultReady>>", when="tail"))
+    latencies = []
+
+    def on_ready(event):
+        for posted in result_queue.drain():
+            latencies.append(time.perf_counter() - posted)
+        if len(latencies) >= count:
+            root.quit()
+
+    root.bind("<<ResultReady>>", on_ready)
+    # 等主循环启动后再开始放入结果
+    root.after_idle(lambda: threading.Thread(target=producer, args=(result_queue, count), daemon=True).start())
+    root.mainloop()
+    root.destroy()
+    return summarize(latencies)
+
+
+if __name__ == "__main__":
+    count = 100
+    for name, run in (("定时轮询", run_polling), ("事件通知", run_event)):
+        mean, p50, p99 = run(count)
+        print(f"{name}: 平均 {mean:.2f}ms, p50 {p50:.2f}ms, p99 {p99:.2f}ms")
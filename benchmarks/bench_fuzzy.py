@@ -0,0 +1,112 @@
+# bench_fuzzy.py
+# 对比 find_closest_match 的删除字典查询与原来的线性扫描
+import os
+import random
+import string
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import DanbooruScraper, SpellingIndex  # noqa: E402
+
+
+SUBJECTS = ("hair", "eyes", "skirt", "uniform", "dress", "ribbon", "gloves", "hat", "boots", "jacket",
+            "smile", "blush", "tears", "wings", "tail", "sword", "flower", "umbrella", "book", "cup")
+MODIFIERS = ("black", "white", "red", "blue", "green", "pink", "purple", "silver", "blonde", "brown",
+             "long", "short", "very_long", "twin", "side", "striped", "frilled", "torn", "open", "closed")
+
+
+def make_vocabulary(size, seed=0):
+    """生成类似 long_hair、striped_frilled_skirt_(xyz) 的标签名，大量标签共享前缀和后缀"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        parts = [rng.choice(MODIFIERS) for _ in range(rng.randint(1, 2))] + [rng.choice(SUBJECTS)]
+        word = '_'.join(parts)
+        if word in words:
+            word += f"_({''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 8)))})"
+        words.add(word)
+    return sorted(words)
+
+
+def make_typo(word, rng):
+    """对单词做一到两处随机编辑"""
+    chars = list(word)
+    for _ in range(rng.randint(1, 2)):
+        op = rng.choice(('insert', 'delete', 'replace'))
+        pos = rng.randrange(len(chars))
+        if op == 'insert':
+            chars.insert(pos, rng.choice(string.ascii_lowercase))
+        elif op == 'delete' and len(chars) > 4:
+            del chars[pos]
+        else:
+            chars[pos] = rng.choice(string.ascii_lowercase)
+    return ''.join(chars)
+
+
+def linear_scan(scraper, word, max_distance):
+    """原 find_closest_match 的线性扫描实现，返回最佳候选的距离"""
+    if word in scraper.spelling_index:
+        return 0
+
+    min_distance = float('inf')
+    best_match = None
+    for candidate in scraper.spelling_index:
+        if word in candidate or candidate in word:
+            continue
+        distance = scraper.levenshtein_distance(word, candidate)
+        if distance < min_distance:
+            min_distance = distance
+            best_match = candidate
+    if best_match and min_distance <= max_distance:
+        return min_distance
+    return None
+
+
+def run(size, queries=200):
+    rng = random.Random(size)
+    vocabulary = make_vocabulary(size)
+
+    # 不构造完整的 DanbooruScraper，避免读取本地数据库和探测浏览器
+    scraper = DanbooruScraper.__new__(DanbooruScraper)
+    scraper.lock = threading.RLock()
+    start = time.perf_counter()
+    scraper.spelling_index = SpellingIndex()
+    for word in vocabulary:
+        scraper.spelling_index.add_record({'tag': word})
+    build_time = time.perf_counter() - start
+
+    typos = [make_typo(rng.choice(vocabulary), rng) for _ in range(queries)]
+
+    start = time.perf_counter()
+    indexed = [scraper.find_closest_match(typo) for typo in typos]
+    indexed_time = (time.perf_counter() - start) / queries
+
+    # 线性扫描太慢，只取一部分查询
+    sample = typos[:20]
+    max_distance = scraper.spelling_index.fuzzy_index.max_distance
+    start = time.perf_counter()
+    scanned = [linear_scan(scraper, typo.lower(), min(max_distance, len(typo) // 2)) for typo in sample]
+    linear_time = (time.perf_counter() - start) / len(sample)
+
+    agree = 0
+    for typo, result, distance in zip(sample, indexed, scanned):
+        if typo in scraper.spelling_index:
+            found = 0
+        elif result is None:
+            found = None
+        else:
+            found = scraper.levenshtein_distance(typo, result)
+        if found == distance:
+            agree += 1
+
+    print(f"词汇量 {size:>7}: 构建 {build_time:.2f}s, "
+          f"索引查询 {indexed_time * 1000:.3f}ms/次, 线性扫描 {linear_time * 1000:.1f}ms/次, "
+          f"结果一致 {agree}/{len(sample)}")
+
+
+if __name__ == "__main__":
+    for size in (1000, 10000, 100000):
+        run(size)
@@ -0,0 +1,121 @@
+# bench_html.py
+# 对比单次遍历的 convert_element_to_text 与原来“序列化后重新解析 + 递归拼接”的实现
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from main import DanbooruScraper  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'wiki_pages')
+
+
+class LegacyConverter:
+    """原递归实现，仅用于对照输出和计时"""
+
+    def convert_html_to_text(self, html_content):
+        if not html_content:
+            return ""
+        soup = BeautifulSoup(html_content, 'html.parser')
+        for tag in soup(['script', 'style', 'noscript']):
+            tag.decompose()
+        return self.process_node(soup, level=0).strip()
+
+    def process_node(self, node, level=0):
+        if isinstance(node, str):
+            return node
+        if node.name == 'a':
+            return self.process_link(node)
+        if node.name in ['ul', 'ol']:
+            return self.process_list_container(node, level)
+        if node.name == 'li':
+            return self.process_list_item(node, level)
+        if node.name in ['h4', 'h5', 'h6']:
+            return f"\n\n{self.get_node_text(node)}\n\n"
+        if node.name in ['p', 'div']:
+            return f"\n\n{self.get_node_text(node)}\n\n"
+        if node.name == 'br':
+            return "\n"
+        return self.get_node_text(node)
+
+    def process_list_container(self, node, level):
+        items = []
+        for child in node.children:
+            if child.name in ['li', 'ul', 'ol']:
+                processed = self.process_node(child, level)
+                if processed:
+                    items.append(processed)
+        return "\n".join(items)
+
+    def process_list_item(self, node, level):
+        contents = []
+        for child in node.children:
+            processed = self.process_node(child, level + 1)
+            if processed:
+                contents.append(processed)
+        indent = "  " * level
+        content = " ".join(contents).strip()
+        return f"{indent}{content}" if content else ""
+
+    def get_node_text(self, node):
+        parts = []
+        for child in node.children:
+            processed = self.process_node(child)
+            if processed:
+                parts.append(processed)
+        return " ".join(parts)
+
+    def process_link(self, node):
+        text = node.get_text(strip=False)
+        if node.find('img'):
+            return ""
+        return text
+
+
+def page_elements(soup):
+    wiki_body = soup.find('div', id='wiki-page-body')
+    return [element for element in wiki_body.children if element.name in ['p', 'ul', 'ol']]
+
+
+def run(rounds=200):
+    scraper = DanbooruScraper.__new__(DanbooruScraper)
+    legacy = LegacyConverter()
+
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+
+        for parser in ('html.parser', 'lxml'):
+            try:
+                soup = BeautifulSoup(html, parser)
+            except Exception:
+                continue
+            elements = page_elements(soup)
+
+            expected = [legacy.convert_html_to_text(str(element)) for element in elements]
+            actual = [scraper.convert_element_to_text(element) for element in elements]
+            identical = expected == actual
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for element in elements:
+                    legacy.convert_html_to_text(str(element))
+            legacy_time = (time.perf_counter() - start) / rounds
+
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for element in elements:
+                    scraper.convert_element_to_text(element)
+            direct_time = (time.perf_counter() - start) / rounds
+
+            print(f"{os.path.basename(path):<24} {parser:<12} 旧实现 {legacy_time * 1000:.3f}ms/页, "
+                  f"单次遍历 {direct_time * 1000:.3f}ms/页, 加速 {legacy_time / direct_time:.1f}x, "
+                  f"输出一致: {'是' if identical else '否'}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,125 @@
+# bench_load.py
+# 通过本地模拟服务器端到端测试标签查询的吞吐量，可注入延迟、404、429和Cloudflare验证页面
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import main  # noqa: E402
+from main import DanbooruScraper, RateLimiter, metrics  # noqa: E402
+from mock_server import FaultInjector, start_server  # noqa: E402
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_batch(scraper, tags, concurrency):
+    """并发查询一批标签，返回每次查询的耗时和结果状态"""
+    latencies = []
+
+    def lookup(tag):
+        start = time.perf_counter()
+        scraper.get_tag_info(tag)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(lookup, tags))
+    elapsed = time.perf_counter() - start
+
+    statuses = {}
+    for result in scraper.queue.drain():
+        key = 'cached' if result.get('cached') else result['status']
+        statuses[key] = statuses.get(key, 0) + 1
+    return latencies, elapsed, statuses
+
+
+def run(args):
+    faults = FaultInjector(args.latency, args.jitter, args.not_found_rate, args.rate_limit_rate,
+                           args.challenge_rate, seed=args.seed)
+    server, base_url = start_server(faults=faults, replay_any=True)
+
+    # 在临时目录中运行，避免读写真实的标签数据库
+    os.chdir(tempfile.mkdtemp())
+    scraper = DanbooruScraper(base_url, load_async=True)
+    scraper.ready.set()
+    scraper.fetch_mode = args.mode
+    scraper.prefetch_depth = 0
+    scraper.browser_manager.browser_path = None  # 不启动浏览器刷新身份
+    scraper.rate_limiter = scraper.engine.rate_limiter = RateLimiter(args.rate, args.burst) if args.rate else None
+    scraper.engine.retry_delay = args.retry_delay
+    scraper.engine.timeout = args.timeout
+    metrics.reset()
+
+    report = {
+        'config': vars(args),
+        'batches': []
+    }
+    try:
+        for batch in range(args.batches):
+            tags = [f"load_{batch}_{i}" for i in range(args.batch_size)]
+            latencies, elapsed, statuses = run_batch(scraper, tags, args.concurrency)
+            latencies.sort()
+            counters = metrics.snapshot()['counters']
+            requests_made = sum(count for name, count in counters.items() if name.startswith('fetch.status.'))
+            result = {
+                'batch': batch,
+                'tags_per_second': len(tags) / elapsed,
+                'p50_ms': percentile(latencies, 0.5) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'statuses': statuses,
+                'retries': counters.get('fetch.retries', 0),
+                'requests': requests_made,
+                'http_status': {name[len('fetch.status.'):]: count for name, count in counters.items()
+                                if name.startswith('fetch.status.')}
+            }
+            report['batches'].append(result)
+            print(f"第 {batch + 1} 批: {result['tags_per_second']:.1f} 标签/秒, p50 {result['p50_ms']:.1f}ms, "
+                  f"p99 {result['p99_ms']:.1f}ms, 重试 {result['retries']} 次, 请求 {requests_made} 次, "
+                  f"结果 {statuses}", file=sys.stderr)
+            metrics.reset()
+        report['injected'] = dict(faults.counts)
+    finally:
+        scraper.close()
+        server.shutdown()
+        server.server_close()
+    return report
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="通过模拟服务器压测标签查询")
+    parser.add_argument('--batches', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8, help="同时发起查询的线程数")
+    parser.add_argument('--mode', choices=('json', 'html'), default=main.FETCH_MODE)
+    parser.add_argument('--rate', type=float, default=0, help="每秒请求数，0表示不限速")
+    parser.add_argument('--burst', type=int, default=main.REQUEST_BURST)
+    parser.add_argument('--timeout', type=float, default=main.FETCH_TIMEOUT)
+    parser.add_argument('--retry-delay', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟服务器每个请求的延迟秒数")
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--not-found-rate', type=float, default=0.05)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.02)
+    parser.add_argument('--challenge-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="结果JSON的保存路径，默认输出到标准输出")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main_cli()
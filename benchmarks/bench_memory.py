@@ -0,0 +1,133 @@
+# bench_memory.py
+# 对比完整字典记录与紧凑记录（正文按需读取）常驻内存的大小，
+# 并在独立进程中测量 load_database 之后（记录加全部索引）的常驻内存
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from main import TagStore, TagRecord  # noqa: E402
+
+WORDS = ("hair", "long", "girl", "smile", "school", "uniform", "skirt", "blue", "eyes", "red",
+         "holding", "looking", "viewer", "open", "mouth", "standing", "sitting", "outdoors")
+
+
+def make_records(size, seed=0):
+    """生成带释义和章节的模拟记录，正文长度接近真实wiki页面"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(size):
+        tag = '_'.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + f"_{i}"
+        sections = {
+            rng.choice(("See also", "Related tags", "Examples", "Notes")) + f" {n}":
+                ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 120)))
+            for n in range(rng.randint(0, 4))
+        }
+        records.append({
+            'tag': tag,
+            'tag_translation': '',
+            'synonyms': ', '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 3))),
+            'meaning': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(30, 200))),
+            'meaning_translation': '',
+            'sections': sections,
+            'posts': rng.randint(0, 100000),
+            'fetched_at': time.time()
+        })
+    return records
+
+
+def measure(load):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = load()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current, elapsed
+
+
+def run(size):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TagStore(os.path.join(tmp, 'tag_data.db'))
+        store.upsert_many(make_records(size))
+
+        def load_dicts():
+            return store.load_all()
+
+        def load_compact():
+            return {
+                tag_info['tag']: TagRecord.from_dict(tag_info, store, with_body=False)
+                for batch in store.iter_records() for tag_info in batch
+            }
+
+        dict_bytes, dict_time = measure(load_dicts)
+        compact_bytes, compact_time = measure(load_compact)
+
+        # 按需读取单条正文的耗时
+        compact = load_compact()
+        keys = random.Random(size).sample(list(compact), min(200, size))
+        start = time.perf_counter()
+        for key in keys:
+            compact[key].to_dict()
+        body_time = (time.perf_counter() - start) / len(keys)
+        store.conn.close()
+
+    print(f"记录数 {size:>7}: 完整字典 {dict_bytes / 1048576:7.1f}MB ({dict_time:.2f}s), "
+          f"紧凑记录 {compact_bytes / 1048576:7.1f}MB ({compact_time:.2f}s), "
+          f"节省 {1 - compact_bytes / dict_bytes:.0%}, 按需读取正文 {body_time * 1000:.3f}ms/条")
+
+
+def rss_bytes():
+    """当前进程的常驻内存（仅Linux）"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def load_child(workdir):
+    """在子进程中加载数据库，输出加载前后的常驻内存差和用时"""
+    os.chdir(workdir)
+    main.metrics.enabled = False
+    scraper = main.DanbooruScraper(load_async=True)
+    gc.collect()
+    before = rss_bytes()
+    start = time.perf_counter()
+    scraper.load_database()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    after = rss_bytes()
+    print(json.dumps({'rss_bytes': after - before, 'seconds': elapsed, 'tags': len(scraper.tag_data),
+                      'spelling_words': len(scraper.spelling_index), 'search_docs': len(scraper.search_index)}))
+    scraper.close()
+
+
+def run_load(size):
+    """生成数据库后在新进程中完整加载，避免生成数据时的内存影响测量"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TagStore(os.path.join(tmp, 'tag_data.db'))
+        store.upsert_many(make_records(size))
+        store.conn.close()
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--load-child', tmp],
+                                         stderr=subprocess.DEVNULL, text=True)
+    result = json.loads(output.strip().splitlines()[-1])
+    print(f"记录数 {size:>7}: load_database 后常驻内存增加 {result['rss_bytes'] / 1048576:7.1f}MB "
+          f"({result['seconds']:.2f}s), 拼写词汇 {result['spelling_words']}, 搜索记录 {result['search_docs']}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == '--load-child':
+        load_child(sys.argv[2])
+    else:
+        for size in (1000, 10000, 100000):
+            run(size)
+        for size in (1000, 10000, 100000):
+            run_load(size)
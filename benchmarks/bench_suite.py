@@ -0,0 +1,235 @@
+# bench_suite.py
+# 在合成的标签数据库上测量核心方法的耗时，结果以JSON输出，便于比较不同版本
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import main  # noqa: E402
+from main import DanbooruScraper  # noqa: E402
+
+FIXTURE_DIR = os.path.join(ROOT_DIR, 'fixtures', 'wiki_pages')
+
+SUBJECTS = ("hair", "eyes", "skirt", "uniform", "dress", "ribbon", "gloves", "hat", "boots", "jacket",
+            "smile", "blush", "tears", "wings", "tail", "sword", "flower", "umbrella", "book", "cup")
+COLORS = ("black", "white", "red", "blue", "green", "pink", "purple", "silver", "blonde", "brown")
+SHAPES = ("long", "short", "very_long", "twin", "side", "striped", "frilled", "torn", "open", "closed")
+SECTION_TITLES = ("See also", "Related tags", "Notes", "Tag group", "Trivia", "External links")
+FILLER = ("the", "tag", "is", "used", "for", "images", "where", "a", "character", "has", "with",
+          "should", "not", "be", "confused", "this", "only", "when", "visible", "clearly")
+
+
+def make_sentence(rng, words=12):
+    return ' '.join(rng.choice(FILLER + SUBJECTS + COLORS) for _ in range(words)).capitalize() + '.'
+
+
+def make_corpus(size, seed=0):
+    """生成size条记录，标签名、同义词、释义和章节的长度分布接近真实wiki"""
+    rng = random.Random(seed)
+    corpus = {}
+    while len(corpus) < size:
+        parts = [rng.choice(COLORS + SHAPES), rng.choice(SUBJECTS)]
+        if rng.random() < 0.5:
+            parts.insert(0, rng.choice(SHAPES))
+        tag = '_'.join(parts)
+        if tag in corpus:
+            tag += '_' + ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 5)))
+        if tag in corpus:
+            continue
+        sections = {}
+        for title in rng.sample(SECTION_TITLES, rng.randint(0, 4)):
+            items = [f"* {rng.choice(COLORS)} {rng.choice(SUBJECTS)}" for _ in range(rng.randint(2, 12))]
+            sections[title] = '\n'.join(items + [make_sentence(rng) for _ in range(rng.randint(0, 3))])
+        corpus[tag] = {
+            'tag': tag,
+            'tag_translation': '',
+            'synonyms': ', '.join(f"{tag}_{n}" for n in range(rng.randint(0, 3))),
+            'meaning': ' '.join(make_sentence(rng, rng.randint(6, 20)) for _ in range(rng.randint(1, 8))),
+            'meaning_translation': '',
+            'sections': sections,
+            'posts': int(rng.paretovariate(1.2) * 10),
+            'fetched_at': time.time(),
+            'etag': '',
+            'last_modified': ''
+        }
+    return corpus
+
+
+def make_typo(word, rng):
+    chars = list(word)
+    pos = rng.randrange(len(chars))
+    op = rng.choice(('insert', 'delete', 'replace', 'swap'))
+    if op == 'insert':
+        chars.insert(pos, rng.choice(string.ascii_lowercase))
+    elif op == 'delete' and len(chars) > 4:
+        del chars[pos]
+    elif op == 'swap' and pos < len(chars) - 1:
+        chars[pos], chars[pos + 1] = chars[pos + 1], chars[pos]
+    else:
+        chars[pos] = rng.choice(string.ascii_lowercase)
+    return ''.join(chars)
+
+
+def measure(func, repeat=5, number=1):
+    """执行repeat轮、每轮number次，返回单次耗时的统计（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number * 1000)
+    samples.sort()
+    return {
+        'repeat': repeat,
+        'number': number,
+        'min_ms': samples[0],
+        'median_ms': samples[len(samples) // 2],
+        'mean_ms': sum(samples) / len(samples),
+        'max_ms': samples[-1]
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_corpus(size, results):
+    rng = random.Random(size)
+    corpus = make_corpus(size)
+    tags = list(corpus)
+    # 重量级操作在大语料上只跑一轮
+    heavy = 1 if size >= 100000 else 3
+
+    def record(name, stats):
+        stats.update(name=name, size=size)
+        results.append(stats)
+        print(f"{name:<28} {size:>7}: 中位数 {stats['median_ms']:10.3f}ms", file=sys.stderr)
+
+    scraper = DanbooruScraper(load_async=True)
+    try:
+        scraper.store.upsert_many(corpus.values())
+        del corpus
+
+        record('load_data', measure(scraper.load_data, heavy))
+        record('load_database', measure(scraper.reload_data, heavy))
+        record('build_spelling_index', measure(scraper.build_spelling_index, heavy))
+        record('build_search_index', measure(scraper.build_search_index, heavy))
+
+        sample = rng.sample(tags, min(200, len(tags)))
+
+        def save_one():
+            for tag in sample:
+                scraper.save_data(tag)
+            scraper.journal.flush()
+
+        record('save_data', measure(save_one, 3))
+        record('save_data_all', measure(scraper.save_data, heavy))
+
+        queries = [tag[:rng.randint(2, len(tag))] for tag in sample[:50]]
+        queries += [rng.choice(SUBJECTS) for _ in range(10)] + ['x', 'zz_no_match']
+        record('search_db', measure(lambda: [scraper.search_db(query) for query in queries], 5))
+        record('autocomplete', measure(lambda: [scraper.autocomplete(query) for query in queries], 5))
+
+        typos = [make_typo(tag, rng) for tag in sample[:50]]
+        record('find_closest_match', measure(lambda: [scraper.find_closest_match(typo) for typo in typos], 5))
+
+        pairs = [(tag, make_typo(tag, rng)) for tag in sample[:100]]
+        record('levenshtein_distance',
+               measure(lambda: [scraper.levenshtein_distance(a, b) for a, b in pairs], 5, 10))
+    finally:
+        scraper.close()
+
+
+def bench_fixtures(results):
+    scraper = DanbooruScraper.__new__(DanbooruScraper)
+    scraper.html_parser = main.HTML_PARSER
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        wiki_body = BeautifulSoup(html, scraper.html_parser).find('div', id='wiki-page-body')
+        name = os.path.basename(path)
+
+        stats = measure(lambda: scraper.process_wiki_content(wiki_body), 5, 50)
+        stats.update(name='process_wiki_content', fixture=name, parser=scraper.html_parser)
+        results.append(stats)
+        stats = measure(lambda: BeautifulSoup(html, scraper.html_parser), 5, 20)
+        stats.update(name='parse_html', fixture=name, parser=scraper.html_parser)
+        results.append(stats)
+        print(f"process_wiki_content {name:<24} 中位数 {results[-2]['median_ms']:.3f}ms", file=sys.stderr)
+
+
+def compare(results, baseline_path):
+    """和之前保存的结果比较，打印中位数的变化"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    def key(item):
+        return (item['name'], item.get('size'), item.get('fixture'))
+
+    before = {key(item): item for item in baseline['results']}
+    print(f"与 {baseline_path} 比较（{baseline.get('revision')} -> {git_revision()}）:", file=sys.stderr)
+    for item in results:
+        old = before.get(key(item))
+        if old is None:
+            continue
+        ratio = item['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        label = item.get('fixture') or item.get('size')
+        print(f"  {item['name']:<28} {label!s:>24}: {old['median_ms']:10.3f}ms -> {item['median_ms']:10.3f}ms "
+              f"({ratio:.2f}x)", file=sys.stderr)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="核心方法的基准测试")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="语料规模，逗号分隔")
+    parser.add_argument('--output', help="结果JSON的保存路径，默认输出到标准输出")
+    parser.add_argument('--compare', metavar='BASELINE', help="与之前保存的结果JSON比较")
+    args = parser.parse_args()
+
+    results = []
+    # 在临时目录中运行，避免读写真实的标签数据库
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    main.metrics.enabled = False
+    for size in (int(size) for size in args.sizes.split(',') if size):
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        bench_corpus(size, results)
+    bench_fixtures(results)
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'html_parser': main.HTML_PARSER,
+        'aiohttp': main.aiohttp is not None,
+        'timestamp': time.time(),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main_cli()
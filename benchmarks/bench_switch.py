@@ -0,0 +1,82 @@
+# bench_switch.py
+# 对比切换标签时重建章节控件与复用控件池的耗时（需要图形界面环境）
+import os
+import random
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from main import EasyDanTagApp, SectionFrame  # noqa: E402
+
+WORDS = ("hair", "long", "girl", "smile", "school", "uniform", "skirt", "blue", "eyes", "red")
+
+
+def make_records(count, sections, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        records.append({
+            'tag': f"tag_{i}",
+            'tag_translation': '',
+            'synonyms': '',
+            'meaning': ' '.join(rng.choice(WORDS) for _ in range(200)),
+            'meaning_translation': '',
+            'sections': {
+                f"Section {n}": '\n'.join(' '.join(rng.choice(WORDS) for _ in range(30)) for _ in range(40))
+                for n in range(rng.randint(sections // 2, sections))
+            },
+            'posts': rng.randint(0, 100000)
+        })
+    return records
+
+
+def legacy_display(app, tag_info):
+    """原 display_tag_info 的章节部分：销毁全部章节控件后逐个重建并立即填充"""
+    for widget in app.dynamic_frame.winfo_children():
+        widget.destroy()
+    app.tag_label.config(text=tag_info['tag'])
+    app.meaning_text.config(state=tk.NORMAL)
+    app.meaning_text.delete(1.0, tk.END)
+    app.meaning_text.insert(tk.END, tag_info.get('meaning', ''))
+    app.meaning_text.config(state=tk.DISABLED)
+    for section_title, section_content in tag_info.get('sections', {}).items():
+        SectionFrame(app.dynamic_frame, title=section_title, content=section_content)
+    app.section_pool = []
+    app.section_count = 0
+
+
+def measure(root, display, records):
+    times = []
+    for record in records:
+        start = time.perf_counter()
+        display(record)
+        root.update()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return sum(times) / len(times), times[len(times) * 99 // 100]
+
+
+def run(sections, switches=100):
+    records = make_records(switches, sections)
+    root = tk.Tk()
+    app = EasyDanTagApp(root)
+    root.update()
+
+    legacy_mean, legacy_p99 = measure(root, lambda record: legacy_display(app, record), records)
+    pooled_mean, pooled_p99 = measure(root, app.display_tag_info, records)
+    root.destroy()
+
+    print(f"每条最多 {sections:>2} 个章节: 重建 {legacy_mean * 1000:.1f}ms (p99 {legacy_p99 * 1000:.1f}ms), "
+          f"复用 {pooled_mean * 1000:.1f}ms (p99 {pooled_p99 * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    # 在临时目录中运行，避免读写真实的标签数据库
+    os.chdir(tempfile.mkdtemp())
+    main.IDENTITY_REFRESH_DELAY = 3600
+    for sections in (4, 12, 24):
+        run(sections)
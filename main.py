@@ -1,29 +1,173 @@
 import webbrowser
+import argparse
+import csv
 import requests
 import time
-import random
 from bs4 import BeautifulSoup
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox, scrolledtext, filedialog
 import threading
+import contextlib
 import queue
+import asyncio
+import functools
 import os
 import subprocess
 import tempfile
+import shutil
 import json
 import re
+import heapq
+import itertools
 import os.path
+import sqlite3
+import email.utils
+from array import array
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import quote, unquote, urlsplit, parse_qs
 import pyperclip
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
 WINDOW_WIDTH = 570
 WINDOW_HEIGHT = 750
+AUTOCOMPLETE_LIMIT = 50
+REQUEST_RATE = 1.0  # 每秒请求数
+REQUEST_BURST = 3
+BATCH_WORKERS = 4
+FETCH_TIMEOUT = 15
+FETCH_RETRIES = 2
+FETCH_RETRY_DELAY = 3
+FETCH_RETRY_STATUSES = (429, 500, 502, 503, 504)  # 限流和服务器错误，等待后重试
+FETCH_RETRY_MAX_DELAY = 60  # Retry-After 的上限秒数
+FETCH_LIMIT_PER_HOST = 4
+FETCH_MODE = 'json'  # 'json' 使用API接口，'html' 解析网页
+HTML_SKIP_TAGS = {'script', 'style', 'noscript'}
+NEGATIVE_CACHE_TTL = 7 * 24 * 3600  # 不存在的标签缓存秒数
+NEGATIVE_CACHE_STATUSES = (404, 410)
+STALE_AFTER = 30 * 24 * 3600  # 缓存条目超过该秒数视为过期
+REVALIDATE_INTERVAL = 600  # 后台重新验证的间隔秒数
+REVALIDATE_BATCH = 20  # 每轮最多重新验证的条目数
+IDENTITY_TTL = 6 * 3600  # 浏览器身份（User-Agent和Cookie）有效秒数
+IDENTITY_REFRESH_DELAY = 30  # 启动后多久开始预热浏览器身份
+IDENTITY_REFRESH_MARGIN = 1800  # 距过期不足该秒数时提前刷新
+IDENTITY_CHECK_INTERVAL = 300
+IDENTITY_RETRY_DELAY = 300  # 刷新浏览器身份失败后的首次重试间隔秒数，之后每次失败翻倍
+IDENTITY_RETRY_MAX = 6 * 3600  # 失败重试间隔的上限
+PREFETCH_DEPTH = 1  # 预取链接的层数，1表示只预取查询页面中的直接链接，0表示关闭
+PREFETCH_BUDGET = 10  # 每次查询最多预取的页面数
+IMPORT_BATCH_SIZE = 500  # 批量导入时每个事务写入的行数
+JOURNAL_FLUSH_INTERVAL = 2  # 修改写入日志后，合并多少秒内的修改再写入数据库
+LOAD_BATCH_SIZE = 500  # 启动时每批读取并建立索引的记录数
+DB_VISIBLE_ROWS = 25  # 结果列表尚未显示时估计的可见行数
+DB_ROW_BUFFER = 10  # 可见行之外额外生成的行数
+SECTION_PRELOAD_MARGIN = 200  # 章节距可见区域底部小于该像素数时提前填充内容
+METRICS_ENABLED = True  # 关闭后计时和计数都是空操作
+METRICS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)  # 耗时直方图的毫秒分界
+METRICS_REFRESH_INTERVAL = 1000  # 性能统计页打开时的刷新间隔（毫秒）
+SERVE_HOST = '127.0.0.1'  # 无界面服务模式默认只监听本机
+SERVE_PORT = 8642
+SERVE_SEARCH_LIMIT = 50  # 搜索接口默认返回的条数
+SERVE_MAX_TAG_LENGTH = 200  # 服务接口接受的标签最大长度
+STARTUP_TIME = time.perf_counter()  # 用于统计首屏显示用时
 
 
 class BrowserManager:
-    def __init__(self):
+    def __init__(self, cache_file='browser_identity.json', ttl=IDENTITY_TTL):
         self.browser_path = self.find_browser()
         self.user_agent = None
         self.cookies = {}
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.identities = self.load_identities()
+        # 站点 -> (连续失败次数, 下次允许刷新的时间)
+        self.failures = {}
+
+    @staticmethod
+    def site_of(url):
+        """取URL的协议和主机部分作为站点键"""
+        parts = url.split('/')
+        return '/'.join(parts[:3]) if '://' in url else url
+
+    def load_identities(self):
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+            except (OSError, ValueError) as e:
+                print(f"读取浏览器身份缓存失败: {e}")
+        return {}
+
+    def save_identities(self):
+        # 先写临时文件再替换，避免中途退出留下损坏的缓存
+        temp_file = self.cache_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.identities, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, self.cache_file)
+
+    def get_cached_identity(self, url):
+        """返回未过期的 (user_agent, cookies)，没有时返回 (None, None)"""
+        with self.lock:
+            identity = self.identities.get(self.site_of(url))
+        if not identity or identity.get('expires_at', 0) <= time.time():
+            return None, None
+        return identity.get('user_agent'), identity.get('cookies', {})
+
+    def needs_refresh(self, url, margin=IDENTITY_REFRESH_MARGIN):
+        """站点曾经需要浏览器身份，且缓存已过期或即将过期；上次刷新失败后的等待期内返回False"""
+        if self.backing_off(url):
+            return False
+        with self.lock:
+            identity = self.identities.get(self.site_of(url))
+        if identity is None:
+            return False
+        return identity.get('expires_at', 0) - time.time() < margin
+
+    def backing_off(self, url):
+        with self.lock:
+            failure = self.failures.get(self.site_of(url))
+        return failure is not None and time.time() < failure[1]
+
+    def mark_needed(self, url):
+        """记录站点需要浏览器身份，后台刷新会处理它"""
+        with self.lock:
+            self.identities.setdefault(self.site_of(url), {'expires_at': 0})
+
+    def refresh_identity(self, url):
+        """启动浏览器获取新身份并写入缓存"""
+        user_agent, cookies = self.get_user_agent_cookies(url)
+        site = self.site_of(url)
+        if not user_agent:
+            # 失败后按指数退避，避免每个检查周期都启动浏览器
+            with self.lock:
+                count = self.failures.get(site, (0, 0))[0] + 1
+                delay = min(IDENTITY_RETRY_DELAY * 2 ** (count - 1), IDENTITY_RETRY_MAX)
+                self.failures[site] = (count, time.time() + delay)
+            return None, None
+        with self.lock:
+            self.failures.pop(site, None)
+            self.identities[site] = {
+                'user_agent': user_agent,
+                'cookies': cookies,
+                'expires_at': time.time() + self.ttl
+            }
+            try:
+                self.save_identities()
+            except OSError as e:
+                print(f"保存浏览器身份缓存失败: {e}")
+        return user_agent, cookies
 
     def find_browser(self):
         paths = [
@@ -90,85 +234,2179 @@ class BrowserManager:
                 return self.user_agent, self.cookies
         except Exception as e:
             print(f"浏览器操作失败: {e}")
+        finally:
+            # 清理临时用户目录
+            shutil.rmtree(user_data_dir, ignore_errors=True)
         return None, None
 
 
+class Histogram:
+    """按固定分界统计耗时分布"""
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(METRICS_BUCKETS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        index = 0
+        while index < len(METRICS_BUCKETS) and ms > METRICS_BUCKETS[index]:
+            index += 1
+        self.buckets[index] += 1
+
+    def percentile(self, fraction):
+        """返回该分位数所在区间的上界，超过最大分界时返回最大值"""
+        target = self.count * fraction
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= target and bucket:
+                return METRICS_BUCKETS[index] if index < len(METRICS_BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0,
+            'p50_ms': self.percentile(0.5),
+            'p90_ms': self.percentile(0.9),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': self.max,
+            'buckets': dict(zip([f"<={bound}" for bound in METRICS_BUCKETS] + ['>'], self.buckets))
+        }
+
+
+class Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """各阶段的计数和耗时直方图，可在界面中查看或导出为JSON"""
+
+    NULL_TIMER = contextlib.nullcontext()
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.timings = {}
+        self.started = time.time()
+
+    def incr(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.timings.get(name)
+            if histogram is None:
+                histogram = self.timings[name] = Histogram()
+            histogram.add(seconds * 1000)
+
+    def timed(self, name):
+        """计时上下文管理器，关闭统计时返回空操作"""
+        if not self.enabled:
+            return self.NULL_TIMER
+        return Timer(self, name)
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.timings = {}
+            self.started = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'started': self.started,
+                'elapsed': time.time() - self.started,
+                'counters': dict(sorted(self.counters.items())),
+                'timings': {name: histogram.to_dict() for name, histogram in sorted(self.timings.items())}
+            }
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+
+metrics = Metrics()
+
+
+class RateLimiter:
+    """令牌桶限速器，在所有请求线程之间共享"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """预留一个令牌，返回需要等待的秒数"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # 令牌不足时记为欠账，后来的请求按顺序排在后面
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def pause(self, seconds):
+        """服务器要求降速时，让之后的所有请求至少等待seconds秒"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def available(self):
+        """当前可用的令牌数，不预留"""
+        with self.lock:
+            return min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+
+
+class FetchResponse:
+    """抓取结果，字段与requests.Response中用到的部分一致"""
+
+    def __init__(self, url, status_code, text, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+
+
+class AsyncFetchEngine:
+    """在单个后台事件循环线程中执行的异步HTTP抓取引擎"""
+
+    def __init__(self, rate_limiter=None, timeout=FETCH_TIMEOUT, retries=FETCH_RETRIES,
+                 retry_delay=FETCH_RETRY_DELAY, limit_per_host=FETCH_LIMIT_PER_HOST):
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.limit_per_host = limit_per_host
+        self.headers = {}
+        self.session = None
+        self.host_limits = {}
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run_loop, name="fetch-loop", daemon=True)
+        self.thread.start()
+
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """从任意线程提交协程，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        """从其他线程提交协程并等待结果"""
+        return self.submit(coro).result()
+
+    def host_limit(self, url):
+        host = url.split('/')[2] if '://' in url else url
+        semaphore = self.host_limits.get(host)
+        if semaphore is None:
+            semaphore = self.host_limits[host] = asyncio.Semaphore(self.limit_per_host)
+        return semaphore
+
+    async def get_session(self):
+        if self.session is None:
+            if aiohttp:
+                # 连接池在所有请求间复用
+                self.session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host),
+                    timeout=aiohttp.ClientTimeout(total=self.timeout))
+            else:
+                self.session = requests.Session()
+        return self.session
+
+    async def request_once(self, url, headers, cookies):
+        session = await self.get_session()
+        if aiohttp:
+            async with session.get(url, headers=headers, cookies=cookies) as response:
+                text = await response.text(errors='replace')
+                return FetchResponse(str(response.url), response.status, text, dict(response.headers))
+
+        # 未安装aiohttp时在默认线程池中使用requests
+        response = await self.loop.run_in_executor(None, functools.partial(
+            session.get, url, headers=headers, cookies=cookies, timeout=self.timeout))
+        return FetchResponse(response.url, response.status_code, response.text, dict(response.headers))
+
+    def retry_after(self, response, attempt):
+        """按Retry-After（秒数或HTTP日期）决定重试前的等待秒数，没有时指数退避"""
+        value = response.headers.get('Retry-After', '').strip()
+        delay = None
+        if value.isdigit():
+            delay = int(value)
+        elif value:
+            try:
+                delay = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is None:
+            delay = self.retry_delay * 2 ** attempt
+        return min(max(delay, 0), FETCH_RETRY_MAX_DELAY)
+
+    async def fetch(self, url, headers=None, cookies=None):
+        """获取URL，网络错误、限流和服务器错误时按设置重试；网络错误全部失败返回None，其余返回最后一次响应"""
+        request_headers = dict(self.headers)
+        if headers:
+            request_headers.update(headers)
+
+        errors = (requests.RequestException, ConnectionError, asyncio.TimeoutError)
+        if aiohttp:
+            errors += (aiohttp.ClientError,)
+
+        for i in range(self.retries):
+            if self.rate_limiter:
+                wait = self.rate_limiter.reserve()
+                metrics.observe('fetch.rate_wait', max(wait, 0))
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            if i:
+                metrics.incr('fetch.retries')
+            try:
+                with metrics.timed('fetch.http'):
+                    async with self.host_limit(url):
+                        response = await self.request_once(url, request_headers, cookies or {})
+                metrics.incr(f'fetch.status.{response.status_code}')
+            except errors as e:
+                metrics.incr('fetch.errors')
+                print(f"请求失败 ({i + 1}/{self.retries}): {e}")
+                if i + 1 < self.retries:
+                    await asyncio.sleep(self.retry_delay)
+                continue
+
+            if response.status_code not in FETCH_RETRY_STATUSES or i + 1 >= self.retries:
+                return response
+            delay = self.retry_after(response, i)
+            if self.rate_limiter:
+                # 限流对所有请求生效：令牌桶整体暂停，下一轮预留令牌时等待
+                self.rate_limiter.pause(delay)
+            else:
+                await asyncio.sleep(delay)
+        return None
+
+    async def close_session(self):
+        if self.session is not None:
+            if aiohttp:
+                await self.session.close()
+            else:
+                self.session.close()
+            self.session = None
+
+    async def cancel_tasks(self):
+        # 取消预取、重新验证等后台循环，避免停止事件循环时留下未完成的任务
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        self.run(self.cancel_tasks())
+        self.run(self.close_session())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+class TagRecord:
+    """常驻内存的紧凑标签记录，释义和章节正文按需从数据库读取"""
+
+    HOT_FIELDS = ('tag', 'tag_translation', 'synonyms', 'posts', 'fetched_at', 'etag', 'last_modified')
+    BODY_FIELDS = ('meaning', 'meaning_translation', 'sections')
+    FIELDS = HOT_FIELDS + BODY_FIELDS
+    __slots__ = HOT_FIELDS + ('body', 'store')
+
+    def __init__(self, tag, tag_translation='', synonyms='', posts=0, fetched_at=0, etag='',
+                 last_modified='', body=None, store=None):
+        self.tag = tag
+        self.tag_translation = tag_translation or ''
+        self.synonyms = synonyms or ''
+        self.posts = posts or 0
+        self.fetched_at = fetched_at or 0
+        self.etag = etag or ''
+        self.last_modified = last_modified or ''
+        self.body = body
+        self.store = store
+
+    @classmethod
+    def from_dict(cls, tag_info, store=None, with_body=True):
+        body = None
+        if with_body:
+            body = {
+                'meaning': tag_info.get('meaning', '') or '',
+                'meaning_translation': tag_info.get('meaning_translation', '') or '',
+                'sections': tag_info.get('sections', {}) or {}
+            }
+        return cls(*(tag_info.get(field) for field in cls.HOT_FIELDS), body=body, store=store)
+
+    def load_body(self):
+        if self.body is not None:
+            return self.body
+        body = self.store.get_body(self.tag) if self.store else None
+        return body or {'meaning': '', 'meaning_translation': '', 'sections': {}}
+
+    def release_body(self):
+        """正文已写入数据库后释放内存中的副本"""
+        if self.store is not None:
+            self.body = None
+
+    def to_dict(self):
+        tag_info = {field: getattr(self, field) for field in self.HOT_FIELDS}
+        tag_info.update(self.load_body())
+        return tag_info
+
+    def __getitem__(self, key):
+        if key in self.BODY_FIELDS:
+            return self.load_body()[key]
+        if key in self.HOT_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.BODY_FIELDS:
+            if self.body is None:
+                self.body = dict(self.load_body())
+            self.body[key] = value
+        elif key in self.HOT_FIELDS:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def keys(self):
+        return self.FIELDS
+
+
+class TagStore:
+    """基于SQLite的标签存储，支持逐条写入和全文检索"""
+
+    COLUMNS = ('tag', 'tag_translation', 'synonyms', 'meaning', 'meaning_translation', 'sections', 'posts',
+               'fetched_at', 'etag', 'last_modified')
+    # 旧版数据库缺少的列，启动时补上
+    ADDED_COLUMNS = {
+        'fetched_at': "REAL NOT NULL DEFAULT 0",
+        'etag': "TEXT NOT NULL DEFAULT ''",
+        'last_modified': "TEXT NOT NULL DEFAULT ''"
+    }
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.fts_enabled = False
+        self.create_tables()
+
+    def create_tables(self):
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS tags (
+                    tag TEXT PRIMARY KEY,
+                    tag_translation TEXT NOT NULL DEFAULT '',
+                    synonyms TEXT NOT NULL DEFAULT '',
+                    meaning TEXT NOT NULL DEFAULT '',
+                    meaning_translation TEXT NOT NULL DEFAULT '',
+                    sections TEXT NOT NULL DEFAULT '{}',
+                    posts INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            existing = {row['name'] for row in self.conn.execute("PRAGMA table_info(tags)")}
+            for column, definition in self.ADDED_COLUMNS.items():
+                if column not in existing:
+                    self.conn.execute(f"ALTER TABLE tags ADD COLUMN {column} {definition}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS tags_fetched_at ON tags (fetched_at)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS negative_cache (
+                    site TEXT NOT NULL,
+                    tag TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    message TEXT NOT NULL DEFAULT '',
+                    suggestion_url TEXT,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (site, tag)
+                )
+            """)
+            # 三元组分词的全文索引用于子串搜索，旧版SQLite不支持时退回普通扫描
+            try:
+                self.conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS tags_fts USING fts5(
+                        tag, tag_standard, synonyms, tag_translation, tokenize='trigram'
+                    )
+                """)
+                self.fts_enabled = True
+            except sqlite3.OperationalError as e:
+                print(f"全文索引不可用: {e}")
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_meta(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, str(value)))
+
+    def row_to_dict(self, row):
+        try:
+            sections = json.loads(row['sections'])
+        except (TypeError, ValueError):
+            sections = {}
+        return {
+            'tag': row['tag'],
+            'tag_translation': row['tag_translation'],
+            'synonyms': row['synonyms'],
+            'meaning': row['meaning'],
+            'meaning_translation': row['meaning_translation'],
+            'sections': sections,
+            'posts': row['posts'],
+            'fetched_at': row['fetched_at'],
+            'etag': row['etag'],
+            'last_modified': row['last_modified']
+        }
+
+    def load_all(self):
+        """按写入顺序读取全部记录"""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM tags ORDER BY rowid").fetchall()
+        return {row['tag']: self.row_to_dict(row) for row in rows}
+
+    def iter_records(self, batch_size=LOAD_BATCH_SIZE):
+        """按写入顺序分批读取记录，批与批之间释放锁"""
+        last_rowid = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT rowid, {', '.join(self.COLUMNS)} FROM tags WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, batch_size)).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1]['rowid']
+            yield [self.row_to_dict(row) for row in rows]
+
+    def get(self, tag):
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM tags WHERE tag = ?", (tag,)).fetchone()
+        return self.row_to_dict(row) if row else None
+
+    def get_body(self, tag):
+        """读取单条记录的释义和章节"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT meaning, meaning_translation, sections FROM tags WHERE tag = ?", (tag,)).fetchone()
+        if row is None:
+            return None
+        try:
+            sections = json.loads(row['sections'])
+        except (TypeError, ValueError):
+            sections = {}
+        return {'meaning': row['meaning'], 'meaning_translation': row['meaning_translation'], 'sections': sections}
+
+    def get_many(self, tags):
+        """按标签名批量读取完整记录"""
+        tags = list(tags)
+        if not tags:
+            return {}
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM tags WHERE tag IN ({', '.join('?' * len(tags))})",
+                tags).fetchall()
+        return {row['tag']: self.row_to_dict(row) for row in rows}
+
+    def stale_tags(self, cutoff, limit):
+        """返回抓取时间早于cutoff的标签，最旧的优先"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT tag FROM tags WHERE fetched_at < ? ORDER BY fetched_at LIMIT ?",
+                (cutoff, limit)).fetchall()
+        return [row['tag'] for row in rows]
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+
+    def _upsert(self, tag_info, update_fts=True):
+        tag = tag_info['tag']
+        if isinstance(tag_info, TagRecord) and tag_info.body is None:
+            # 正文未载入内存的记录，数据库中的正文就是最新的，只更新常驻字段
+            self.conn.execute(
+                "UPDATE tags SET tag_translation = ?, synonyms = ?, posts = ?, fetched_at = ?, "
+                "etag = ?, last_modified = ? WHERE tag = ?",
+                (tag_info.tag_translation, tag_info.synonyms, int(tag_info.posts), float(tag_info.fetched_at),
+                 tag_info.etag, tag_info.last_modified, tag))
+        else:
+            self._upsert_full(tag_info)
+        if self.fts_enabled and update_fts:
+            rowid = self.conn.execute("SELECT rowid FROM tags WHERE tag = ?", (tag,)).fetchone()[0]
+            self.conn.execute("DELETE FROM tags_fts WHERE rowid = ?", (rowid,))
+            self.conn.execute(
+                "INSERT INTO tags_fts (rowid, tag, tag_standard, synonyms, tag_translation) VALUES (?, ?, ?, ?, ?)",
+                (
+                    rowid,
+                    tag.lower(),
+                    tag.replace('_', ' '),
+                    (tag_info.get('synonyms', '') or '').lower().replace(' ', '_'),
+                    (tag_info.get('tag_translation', '') or '').lower()
+                ))
+
+    def _upsert_full(self, tag_info):
+        tag = tag_info['tag']
+        self.conn.execute(
+            f"INSERT INTO tags ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))}) "
+            "ON CONFLICT(tag) DO UPDATE SET "
+            "tag_translation = excluded.tag_translation, synonyms = excluded.synonyms, "
+            "meaning = excluded.meaning, meaning_translation = excluded.meaning_translation, "
+            "sections = excluded.sections, posts = excluded.posts, fetched_at = excluded.fetched_at, "
+            "etag = excluded.etag, last_modified = excluded.last_modified",
+            (
+                tag,
+                tag_info.get('tag_translation', '') or '',
+                tag_info.get('synonyms', '') or '',
+                tag_info.get('meaning', '') or '',
+                tag_info.get('meaning_translation', '') or '',
+                json.dumps(tag_info.get('sections', {}) or {}, ensure_ascii=False),
+                int(tag_info.get('posts', 0) or 0),
+                float(tag_info.get('fetched_at', 0) or 0),
+                tag_info.get('etag', '') or '',
+                tag_info.get('last_modified', '') or ''
+            ))
+
+    def upsert(self, tag_info):
+        """写入或更新单条记录"""
+        with self.lock, self.conn:
+            self._upsert(tag_info)
+
+    def upsert_many(self, tag_infos, update_fts=True):
+        """在同一事务中批量写入记录；不更新全文索引时需在之后调用rebuild_fts"""
+        with self.lock, self.conn:
+            for tag_info in tag_infos:
+                self._upsert(tag_info, update_fts)
+
+    def rebuild_fts(self):
+        """按tags表重新生成全文索引"""
+        if not self.fts_enabled:
+            return
+        with self.lock, self.conn:
+            # SQLite自带的lower只处理ASCII，与逐条写入时Python的lower保持一致
+            self.conn.create_function('py_lower', 1, lambda value: (value or '').lower())
+            self.conn.execute("DELETE FROM tags_fts")
+            self.conn.execute(
+                "INSERT INTO tags_fts (rowid, tag, tag_standard, synonyms, tag_translation) "
+                "SELECT rowid, py_lower(tag), replace(tag, '_', ' '), replace(py_lower(synonyms), ' ', '_'), "
+                "py_lower(tag_translation) FROM tags")
+
+    def delete(self, tag):
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT rowid FROM tags WHERE tag = ?", (tag,)).fetchone()
+            if row is None:
+                return
+            if self.fts_enabled:
+                self.conn.execute("DELETE FROM tags_fts WHERE rowid = ?", (row[0],))
+            self.conn.execute("DELETE FROM tags WHERE rowid = ?", (row[0],))
+
+    def migrate_json(self, json_file):
+        """从旧版JSON文件一次性导入数据"""
+        if self.get_meta('json_migrated') or not os.path.exists(json_file):
+            return 0
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取旧数据失败: {e}")
+            return 0
+
+        records = [info for info in data.values() if isinstance(info, dict) and info.get('tag')]
+        with self.lock, self.conn:
+            for tag_info in records:
+                self._upsert(tag_info)
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('json_migrated', '1') "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value")
+        return len(records)
+
+    def get_negative(self, site, tag, ttl):
+        """读取未过期的“标签不存在”记录，过期记录顺便删除"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, message, suggestion_url, created_at FROM negative_cache WHERE site = ? AND tag = ?",
+                (site, tag)).fetchone()
+            if row is None:
+                return None
+            if time.time() - row['created_at'] > ttl:
+                with self.conn:
+                    self.conn.execute("DELETE FROM negative_cache WHERE site = ? AND tag = ?", (site, tag))
+                return None
+        return {
+            'status': row['status'],
+            'message': row['message'],
+            'suggestion_url': row['suggestion_url'],
+            'created_at': row['created_at']
+        }
+
+    def put_negative(self, site, tag, status, message, suggestion_url):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO negative_cache (site, tag, status, message, suggestion_url, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(site, tag) DO UPDATE SET status = excluded.status, message = excluded.message, "
+                "suggestion_url = excluded.suggestion_url, created_at = excluded.created_at",
+                (site, tag, status, message, suggestion_url, time.time()))
+
+    def delete_negative(self, site=None, tag=None):
+        with self.lock, self.conn:
+            if site is None:
+                self.conn.execute("DELETE FROM negative_cache")
+            else:
+                self.conn.execute("DELETE FROM negative_cache WHERE site = ? AND tag = ?", (site, tag))
+
+    def search(self, query):
+        """在数据库中执行子串搜索，返回按写入顺序排列的标签名"""
+        normalized_query = query.replace(' ', '_').lower()
+        fuzzy_query = normalized_query.replace('_', ' ')
+        params = {'nq': normalized_query, 'fq': fuzzy_query}
+        condition = (
+            "(instr(lower(t.tag), :nq) OR instr(lower(t.tag), :fq) OR "
+            "instr(replace(t.tag, '_', ' '), :nq) OR instr(replace(t.tag, '_', ' '), :fq) OR "
+            "instr(lower(t.tag_translation), :nq) OR "
+            "instr(replace(lower(t.synonyms), ' ', '_'), :nq))"
+        )
+
+        # 三元组索引只能匹配长度不小于3的子串，更短的查询直接扫描
+        if self.fts_enabled and len(normalized_query) >= 3:
+            phrases = {normalized_query, fuzzy_query}
+            params['match'] = " OR ".join('"' + p.replace('"', '""') + '"' for p in sorted(phrases))
+            sql = (
+                "SELECT t.tag FROM tags_fts f JOIN tags t ON t.rowid = f.rowid "
+                f"WHERE tags_fts MATCH :match AND {condition} ORDER BY t.rowid"
+            )
+        else:
+            sql = f"SELECT t.tag FROM tags t WHERE {condition} ORDER BY t.rowid"
+
+        with self.lock:
+            return [row['tag'] for row in self.conn.execute(sql, params)]
+
+
+def bounded_levenshtein(s1, s2, limit):
+    """计算不超过limit的编辑距离，超出时提前返回limit + 1"""
+    if abs(len(s1) - len(s2)) > limit:
+        return limit + 1
+    # 候选词大多与查询词共享很长的前缀或后缀，去掉后只需比较中间不同的部分
+    start = 0
+    end1, end2 = len(s1), len(s2)
+    while start < end1 and start < end2 and s1[start] == s2[start]:
+        start += 1
+    while end1 > start and end2 > start and s1[end1 - 1] == s2[end2 - 1]:
+        end1 -= 1
+        end2 -= 1
+    s1 = s1[start:end1]
+    s2 = s2[start:end2]
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    if not s2:
+        return len(s1) if len(s1) <= limit else limit + 1
+
+    # 只计算对角线两侧limit以内的格子，带外的格子一定超过上限
+    over = limit + 1
+    previous_row = [j if j <= limit else over for j in range(len(s2) + 1)]
+    for i, c1 in enumerate(s1):
+        current_row = [over] * (len(s2) + 1)
+        if i + 1 <= limit:
+            current_row[0] = i + 1
+        row_min = current_row[0]
+        for j in range(max(0, i - limit), min(len(s2), i + limit + 1)):
+            value = min(previous_row[j + 1] + 1, current_row[j] + 1, previous_row[j] + (c1 != s2[j]))
+            current_row[j + 1] = value
+            if value < row_min:
+                row_min = value
+        # 整行都已超过上限时不可能再变小
+        if row_min > limit:
+            return over
+        previous_row = current_row
+
+    return previous_row[-1] if previous_row[-1] <= limit else over
+
+
+class TagImporter:
+    """把CSV或JSON Lines格式的标签导出文件分批流式写入数据库，保留已有翻译"""
+
+    CSV_COLUMNS = ('name', 'category', 'post_count', 'aliases')
+
+    def __init__(self, store, convert_body=None, batch_size=IMPORT_BATCH_SIZE):
+        self.store = store
+        self.convert_body = convert_body
+        self.batch_size = batch_size
+
+    def read_rows(self, path):
+        """逐行产出字典，不一次性读入整个文件"""
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            if path.lower().endswith('.csv'):
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    return
+                # 常见的标签导出没有表头，列依次为名称、分类、作品数、别名
+                if header[0].strip().lower() in ('name', 'tag'):
+                    columns = [column.strip().lower() for column in header]
+                else:
+                    columns = self.CSV_COLUMNS
+                    yield dict(zip(columns, header))
+                for row in reader:
+                    yield dict(zip(columns, row))
+            else:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield {}
+
+    def parse_row(self, row):
+        """统一不同导出格式的字段名，缺少标签名时返回None"""
+        if not isinstance(row, dict):
+            return None
+        name = str(row.get('name') or row.get('tag') or '').strip().lower().replace(' ', '_')
+        if not name:
+            return None
+
+        posts = row.get('post_count', row.get('posts'))
+        try:
+            posts = int(posts) if posts not in (None, '') else None
+        except (TypeError, ValueError):
+            posts = None
+
+        aliases = row.get('aliases') or row.get('other_names') or row.get('synonyms') or []
+        if isinstance(aliases, str):
+            aliases = aliases.split(',')
+        aliases = [str(alias).strip().replace(' ', '_') for alias in aliases if str(alias).strip()]
+
+        body = row.get('body') or row.get('wiki') or row.get('wiki_body') or ''
+        return {'tag': name, 'posts': posts, 'aliases': aliases, 'body': body}
+
+    def merge(self, existing, item):
+        """把导入的字段合并进已有记录，翻译和没有新值的字段保持不变"""
+        if existing:
+            record = dict(existing)
+        else:
+            # 以导入时间作为抓取时间，避免新导入的记录立即全部进入重新验证
+            record = {'tag': item['tag'], 'tag_translation': '', 'synonyms': '', 'meaning': '',
+                      'meaning_translation': '', 'sections': {}, 'posts': 0,
+                      'fetched_at': time.time(), 'etag': '', 'last_modified': ''}
+
+        if item['posts'] is not None:
+            record['posts'] = item['posts']
+
+        synonyms = [syn.strip() for syn in record['synonyms'].split(',') if syn.strip()]
+        for alias in item['aliases']:
+            if alias not in synonyms and alias != item['tag']:
+                synonyms.append(alias)
+        record['synonyms'] = ", ".join(synonyms)
+
+        if item['body'] and self.convert_body:
+            record['meaning'], record['sections'] = self.convert_body(item['body'])
+        return record
+
+    def write_batch(self, batch, counts):
+        existing = self.store.get_many({item['tag'] for item in batch})
+        merged = {}
+        for item in batch:
+            # 同一批中重复的标签依次合并，只按数据库中原有的记录计数一次
+            old = merged.get(item['tag'])
+            if old is None:
+                old = existing.get(item['tag'])
+                counts['updated' if old else 'added'] += 1
+            merged[item['tag']] = self.merge(old, item)
+        self.store.upsert_many(merged.values(), update_fts=False)
+
+    def import_file(self, path, progress=None):
+        """导入文件，返回新增、更新和跳过的行数；每批写入后调用progress(计数)"""
+        counts = {'added': 0, 'updated': 0, 'skipped': 0}
+        batch = []
+        for row in self.read_rows(path):
+            item = self.parse_row(row)
+            if item is None:
+                counts['skipped'] += 1
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch, counts)
+                batch = []
+                if progress:
+                    progress(counts)
+        if batch:
+            self.write_batch(batch, counts)
+            if progress:
+                progress(counts)
+
+        # 全文索引在全部写入后统一重建
+        self.store.rebuild_fts()
+        return counts
+
+
+class TagJournal:
+    """标签修改先追加到日志文件，后台线程合并一段时间内的修改后批量写入数据库"""
+
+    def __init__(self, store, journal_file, interval=JOURNAL_FLUSH_INTERVAL, on_flushed=None):
+        self.store = store
+        self.journal_file = journal_file
+        self.interval = interval
+        self.on_flushed = on_flushed
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = {}
+        self.wake = threading.Event()
+        self.file = None
+
+    def replay(self):
+        """把上次退出前未写入数据库的修改写入数据库，返回条数"""
+        if not os.path.exists(self.journal_file):
+            return 0
+        records = {}
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    tag_info = json.loads(line)
+                except ValueError:
+                    # 写到一半时崩溃，最后一行可能不完整
+                    break
+                records[tag_info['tag']] = tag_info
+        if records:
+            self.store.upsert_many(records.values())
+        os.remove(self.journal_file)
+        return len(records)
+
+    def start(self):
+        self.file = open(self.journal_file, 'a', encoding='utf-8')
+        threading.Thread(target=self.run, name="journal-writer", daemon=True).start()
+
+    def append(self, tag_info):
+        """追加一条修改，返回时已写入日志文件"""
+        line = json.dumps(tag_info, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+            self.pending[tag_info['tag']] = tag_info
+        self.wake.set()
+
+    def is_pending(self, tag):
+        with self.lock:
+            return tag in self.pending
+
+    def discard(self, tag):
+        """丢弃尚未写入数据库的修改，用于删除标签"""
+        with self.lock:
+            self.pending.pop(tag, None)
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            # 等待片刻，把连续的修改合并成一次写入
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except (sqlite3.Error, OSError) as e:
+                print(f"写入数据库失败: {e}")
+
+    def flush(self):
+        """把日志中的修改写入数据库，再用剩余未写入的修改替换日志文件"""
+        with self.flush_lock:
+            with self.lock:
+                self.wake.clear()
+                flushed = self.pending
+                self.pending = {}
+            if not flushed:
+                return
+            try:
+                with metrics.timed('store.flush'):
+                    self.store.upsert_many(flushed.values())
+                metrics.incr('store.flushed_records', len(flushed))
+            except sqlite3.Error:
+                with self.lock:
+                    for tag, tag_info in flushed.items():
+                        self.pending.setdefault(tag, tag_info)
+                raise
+            self.compact()
+            if self.on_flushed:
+                self.on_flushed(flushed)
+
+    def compact(self):
+        # 先写临时文件再原子替换，任何时刻日志文件都是完整的
+        with self.lock:
+            tmp_file = self.journal_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                for tag_info in self.pending.values():
+                    f.write(json.dumps(tag_info, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.file.close()
+            os.replace(tmp_file, self.journal_file)
+            self.file = open(self.journal_file, 'a', encoding='utf-8')
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        with self.lock:
+            self.file.close()
+            self.file = None
+            if not self.pending:
+                os.remove(self.journal_file)
+
+
+class FuzzyIndex:
+    """SymSpell风格的删除字典，支持有界编辑距离的近似词查询
+
+    词的前缀和后缀各建一个删除字典，查询时只比较两边都命中的候选。
+    标签常共享前缀（long_hair_*）或后缀（*_hair），只用一边会得到上万个候选。
+    """
+
+    COMPACT_MIN = 1000  # 已删除的词超过该数量且超过现有词数的四分之一时清理删除字典
+    VERIFY_LIMIT = 64  # 一边的候选不超过该数量时直接逐个计算编辑距离，不再与另一边求交集
+
+    def __init__(self, max_distance=2, prefix_length=7, suffix_length=5):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.suffix_length = suffix_length
+        self.deletes = {}
+        self.suffix_deletes = {}
+        self.words = set()
+        # 删除词时不逐个修改删除字典中的列表，只记在这里，查询时跳过，积累到一定数量再统一清理
+        self.removed = set()
+
+    def generate_deletes(self, key, max_distance):
+        """生成key在给定距离内的所有删除变体"""
+        variants = {key}
+        frontier = [key]
+        for _ in range(max_distance):
+            next_frontier = []
+            for item in frontier:
+                for i in range(len(item)):
+                    variant = item[:i] + item[i + 1:]
+                    if variant not in variants:
+                        variants.add(variant)
+                        next_frontier.append(variant)
+            frontier = next_frontier
+        return variants
+
+    def tables(self, word):
+        """返回 [(删除字典, 该字典使用的键)]"""
+        return ((self.deletes, word[:self.prefix_length]),
+                (self.suffix_deletes, word[-self.suffix_length:]))
+
+    def add(self, word):
+        if word in self.words:
+            return
+        self.words.add(word)
+        if word in self.removed:
+            # 删除字典中还留着这个词
+            self.removed.discard(word)
+            return
+        for deletes, key in self.tables(word):
+            for variant in self.generate_deletes(key, self.max_distance):
+                entry = deletes.get(variant)
+                # 大多数删除变体只对应一个词，直接存字符串以节省内存
+                if entry is None:
+                    deletes[variant] = word
+                elif isinstance(entry, str):
+                    deletes[variant] = [entry, word]
+                else:
+                    entry.append(word)
+
+    def remove(self, word):
+        if word not in self.words:
+            return
+        self.words.discard(word)
+        self.removed.add(word)
+        if len(self.removed) > max(self.COMPACT_MIN, len(self.words) // 4):
+            self.compact()
+
+    def compact(self):
+        """从删除字典中清除已删除的词"""
+        removed = self.removed
+        for deletes in (self.deletes, self.suffix_deletes):
+            for variant, entry in list(deletes.items()):
+                if isinstance(entry, str):
+                    if entry in removed:
+                        del deletes[variant]
+                    continue
+                kept = [word for word in entry if word not in removed]
+                if not kept:
+                    del deletes[variant]
+                elif len(kept) == 1:
+                    deletes[variant] = kept[0]
+                elif len(kept) < len(entry):
+                    deletes[variant] = kept
+        self.removed = set()
+
+    def lookup(self, word, max_distance=None, limit=5, exclude=None):
+        """返回编辑距离不超过max_distance的前limit个候选 [(距离, 词)]"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        if max_distance < 0:
+            return []
+
+        sides = []
+        for deletes, key in self.tables(word):
+            entries = []
+            size = 0
+            for variant in self.generate_deletes(key, max_distance):
+                entry = deletes.get(variant)
+                if entry is not None:
+                    entries.append(entry)
+                    size += 1 if isinstance(entry, str) else len(entry)
+            if not entries:
+                return []
+            sides.append((size, entries))
+
+        # 用较小的一边建立集合；仍然较多时再与另一边求交集
+        sides.sort(key=lambda side: side[0])
+        candidates = set()
+        for entry in sides[0][1]:
+            if isinstance(entry, str):
+                candidates.add(entry)
+            else:
+                candidates.update(entry)
+        if len(candidates) > self.VERIFY_LIMIT:
+            smaller = candidates
+            candidates = set()
+            for entry in sides[1][1]:
+                if isinstance(entry, str):
+                    if entry in smaller:
+                        candidates.add(entry)
+                else:
+                    candidates.update(smaller.intersection(entry))
+        if self.removed:
+            candidates -= self.removed
+
+        matches = []
+        for candidate in candidates:
+            if exclude and exclude(candidate):
+                continue
+            distance = bounded_levenshtein(word, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+        return heapq.nsmallest(limit, matches)
+
+    def __len__(self):
+        return len(self.words)
+
+
+class TrigramIndex:
+    """标签名、同义词与翻译的三元组倒排索引，用于子串搜索"""
+
+    END = '\x00'
+    VERIFY_LIMIT = 64  # 候选不超过该数量时不再与更长的倒排表求交集，直接逐个核对
+
+    def __init__(self):
+        # 倒排表用整数数组保存记录号，比集合小一个数量级
+        self.postings = {}
+        self.gram_prefixes = {}
+        self.doc_ids = {}
+        self.keys = []
+        self.fields = []
+
+    @staticmethod
+    def record_fields(tag_info):
+        """提取参与搜索的字段：标签名、小写的翻译和规范化的同义词"""
+        return (
+            tag_info['tag'],
+            (tag_info.get('tag_translation', '') or '').lower(),
+            (tag_info.get('synonyms', '') or '').lower().replace(' ', '_')
+        )
+
+    @staticmethod
+    def search_texts(fields):
+        """展开为参与匹配的文本，与search_db的匹配规则一一对应"""
+        tag, tag_translation, synonyms = fields
+        return tag.lower(), tag.replace('_', ' '), tag_translation, synonyms
+
+    def record_grams(self, fields):
+        # 每个字段末尾补结束符，使长度为2的子串也能落在某个三元组的前缀上
+        grams = set()
+        for text in self.search_texts(fields):
+            padded = text.lower() + self.END
+            for i in range(len(padded) - 2):
+                grams.add(padded[i:i + 3])
+        return grams
+
+    def add_grams(self, doc_id, grams):
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array('i')
+                self.gram_prefixes.setdefault(gram[:2], set()).add(gram)
+            posting.append(doc_id)
+
+    def remove_grams(self, doc_id, grams):
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                continue
+            try:
+                posting.remove(doc_id)
+            except ValueError:
+                continue
+            if not posting:
+                del self.postings[gram]
+                prefix_grams = self.gram_prefixes.get(gram[:2])
+                if prefix_grams is not None:
+                    prefix_grams.discard(gram)
+                    if not prefix_grams:
+                        del self.gram_prefixes[gram[:2]]
+
+    def update(self, tag_key, tag_info):
+        """新增或更新一条记录"""
+        fields = self.record_fields(tag_info)
+        doc_id = self.doc_ids.get(tag_key)
+        if doc_id is None:
+            doc_id = self.doc_ids[tag_key] = len(self.keys)
+            self.keys.append(tag_key)
+            self.fields.append(fields)
+            self.add_grams(doc_id, self.record_grams(fields))
+            return
+
+        old_fields = self.fields[doc_id]
+        if old_fields == fields:
+            return
+        # 只改动有变化的三元组，从长数组中删除记录号较慢
+        old_grams = self.record_grams(old_fields)
+        grams = self.record_grams(fields)
+        self.remove_grams(doc_id, old_grams - grams)
+        self.add_grams(doc_id, grams - old_grams)
+        self.fields[doc_id] = fields
+
+    def remove(self, tag_key):
+        doc_id = self.doc_ids.pop(tag_key, None)
+        if doc_id is None:
+            return
+        self.remove_grams(doc_id, self.record_grams(self.fields[doc_id]))
+        # 记录号不复用，重建索引时才回收
+        self.keys[doc_id] = None
+        self.fields[doc_id] = None
+
+    def candidates(self, query):
+        """返回可能包含query的记录集合，结果需再逐个核对"""
+        if len(query) == 2:
+            result = set()
+            for gram in self.gram_prefixes.get(query, ()):
+                result.update(self.postings[gram])
+            return result
+
+        postings = []
+        for i in range(len(query) - 2):
+            posting = self.postings.get(query[i:i + 3])
+            if not posting:
+                return set()
+            postings.append(posting)
+
+        # 从最短的倒排表开始求交集，候选已经很少时直接交给核对
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if len(result) <= self.VERIFY_LIMIT:
+                break
+            result.intersection_update(posting)
+        return result
+
+    def search(self, query, limit=None):
+        """子串搜索，返回按写入顺序排列的标签名；查询过短无法使用索引时返回None"""
+        normalized_query = query.replace(' ', '_').lower()
+        fuzzy_query = normalized_query.replace('_', ' ')
+        if len(normalized_query) < 2:
+            return None
+
+        doc_ids = self.candidates(normalized_query)
+        if fuzzy_query != normalized_query:
+            doc_ids |= self.candidates(fuzzy_query)
+
+        results = []
+        for doc_id in sorted(doc_ids):
+            tag_normalized, tag_standard, tag_translation, synonyms = self.search_texts(self.fields[doc_id])
+            if (normalized_query in tag_normalized or
+                    fuzzy_query in tag_normalized or
+                    normalized_query in tag_standard or
+                    fuzzy_query in tag_standard or
+                    normalized_query in tag_translation or
+                    normalized_query in synonyms):
+                results.append(self.keys[doc_id])
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+
+class PrefixTrieNode:
+    # 绝大多数节点只有一个条目，entries 存 (标签, 作品数) 元组，多于一个时才用字典，节省内存
+    __slots__ = ('label', 'children', 'entries', 'best')
+
+    def __init__(self, label=''):
+        self.label = label
+        self.children = None
+        self.entries = None
+        self.best = -1
+
+
+class PrefixTrie:
+    """压缩前缀树，按作品数返回前k个补全结果"""
+
+    def __init__(self):
+        self.root = PrefixTrieNode()
+
+    def insert(self, key, tag_key, posts):
+        node = self.root
+        path = [node]
+        rest = key
+        while rest:
+            child = node.children.get(rest[0]) if node.children else None
+            if child is None:
+                child = PrefixTrieNode(rest)
+                if node.children is None:
+                    node.children = {}
+                node.children[rest[0]] = child
+                node = child
+                path.append(node)
+                break
+
+            label = child.label
+            common = 0
+            limit = min(len(label), len(rest))
+            while common < limit and label[common] == rest[common]:
+                common += 1
+
+            if common < len(label):
+                # 在公共前缀处拆分边
+                middle = PrefixTrieNode(label[:common])
+                child.label = label[common:]
+                middle.children = {child.label[0]: child}
+                middle.best = child.best
+                node.children[rest[0]] = middle
+                child = middle
+
+            node = child
+            path.append(node)
+            rest = rest[common:]
+
+        entries = node.entries
+        if entries is None or (isinstance(entries, tuple) and entries[0] == tag_key):
+            node.entries = (tag_key, posts)
+        elif isinstance(entries, tuple):
+            node.entries = {entries[0]: entries[1], tag_key: posts}
+        else:
+            entries[tag_key] = posts
+        for item in path:
+            if posts > item.best:
+                item.best = posts
+
+    def remove(self, key, tag_key):
+        node = self.root
+        path = [node]
+        rest = key
+        while rest:
+            child = node.children.get(rest[0]) if node.children else None
+            if child is None or not rest.startswith(child.label):
+                return
+            node = child
+            path.append(node)
+            rest = rest[len(child.label):]
+
+        entries = node.entries
+        if entries is None:
+            return
+        if isinstance(entries, tuple):
+            if entries[0] != tag_key:
+                return
+            node.entries = None
+        else:
+            if tag_key not in entries:
+                return
+            del entries[tag_key]
+            if len(entries) == 1:
+                node.entries = next(iter(entries.items()))
+
+        # 自底向上重新计算子树最大作品数，并删除空叶子
+        for i in range(len(path) - 1, -1, -1):
+            item = path[i]
+            best = max(posts for _, posts in self.entry_items(item)) if item.entries else -1
+            if item.children:
+                best = max(best, max(child.best for child in item.children.values()))
+            item.best = best
+            if i and item.entries is None and not item.children:
+                parent = path[i - 1]
+                del parent.children[item.label[0]]
+                if not parent.children:
+                    parent.children = None
+
+    @staticmethod
+    def entry_items(node):
+        """以 (标签, 作品数) 的形式遍历节点的条目"""
+        if isinstance(node.entries, tuple):
+            return (node.entries,)
+        return node.entries.items()
+
+    def find_node(self, prefix):
+        node = self.root
+        rest = prefix
+        while rest:
+            child = node.children.get(rest[0]) if node.children else None
+            if child is None:
+                return None
+            if rest.startswith(child.label):
+                rest = rest[len(child.label):]
+            elif child.label.startswith(rest):
+                rest = ''
+            else:
+                return None
+            node = child
+        return node
+
+    def complete(self, prefix, limit=10):
+        """按作品数从高到低返回前limit个以prefix开头的标签"""
+        node = self.find_node(prefix)
+        if node is None or limit <= 0:
+            return []
+
+        # 子树最大值不小于其中任何条目，按最大值优先展开，取满limit个即停止
+        results = []
+        seen = set()
+        counter = 0
+        heap = [(-node.best, 1, counter, node)]
+        while heap and len(results) < limit:
+            priority, kind, key, item = heapq.heappop(heap)
+            if kind == 0:
+                if key not in seen:
+                    seen.add(key)
+                    results.append(key)
+                continue
+            if item.entries:
+                for tag_key, posts in self.entry_items(item):
+                    heapq.heappush(heap, (-posts, 0, tag_key, None))
+            if item.children:
+                for child in item.children.values():
+                    counter += 1
+                    heapq.heappush(heap, (-child.best, 1, counter, child))
+        return results
+
+
+class SpellingIndex:
+    """带引用计数的拼写索引，按单条记录增量维护"""
+
+    WORD_PATTERN = re.compile(r'\b\w+\b')
+    MIN_WORD_LENGTH = 4
+
+    def __init__(self):
+        self.counts = {}
+        self.fuzzy_index = FuzzyIndex()
+
+    def record_words(self, tag_info):
+        """提取单条记录贡献的词汇（同一记录内去重）"""
+        words = {tag_info['tag'].lower()}
+
+        # 添加同义词
+        if tag_info.get('synonyms'):
+            for syn in tag_info['synonyms'].split(','):
+                words.add(syn.strip().lower())
+
+        # 添加释义中的关键词
+        if tag_info.get('meaning'):
+            words.update(self.WORD_PATTERN.findall(tag_info['meaning'].lower()))
+
+        # 添加章节内容中的关键词
+        if tag_info.get('sections'):
+            for section in tag_info['sections'].values():
+                words.update(self.WORD_PATTERN.findall(section.lower()))
+
+        # 过滤掉过短的词汇
+        return {word for word in words if len(word) >= self.MIN_WORD_LENGTH}
+
+    def add_record(self, tag_info):
+        added = []
+        for word in self.record_words(tag_info):
+            count = self.counts.get(word, 0)
+            if not count:
+                added.append(word)
+                self.fuzzy_index.add(word)
+            self.counts[word] = count + 1
+        return added
+
+    def remove_record(self, tag_info):
+        removed = []
+        for word in self.record_words(tag_info):
+            count = self.counts.get(word, 0)
+            if count <= 1:
+                if count:
+                    del self.counts[word]
+                    removed.append(word)
+                    self.fuzzy_index.remove(word)
+            else:
+                self.counts[word] = count - 1
+        return removed
+
+    def replace_record(self, old_info, new_info):
+        """用新记录替换旧记录，返回新增和移除的词汇"""
+        removed = self.remove_record(old_info) if old_info else []
+        added = self.add_record(new_info) if new_info else []
+        # 同一词汇先移除后又加入时两边都不算变化
+        both = set(removed) & set(added)
+        if both:
+            removed = [w for w in removed if w not in both]
+            added = [w for w in added if w not in both]
+        return added, removed
+
+    def find_similar(self, word, max_distance=None, limit=5, exclude=None):
+        """查询编辑距离有界的前limit个相近词"""
+        return self.fuzzy_index.lookup(word, max_distance, limit, exclude)
+
+    def __contains__(self, word):
+        return word in self.counts
+
+    def __iter__(self):
+        return iter(self.counts)
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class HtmlTextFrame:
+    """HTML转文本时的遍历栈帧"""
+
+    __slots__ = ('children', 'mode', 'level', 'child_level', 'separator', 'has_output', 'slot')
+
+    def __init__(self, children, mode, level):
+        self.children = children
+        self.mode = mode
+        self.level = level
+        self.child_level = level if mode == 'list' else 0
+        self.separator = "\n" if mode == 'list' else " "
+        self.has_output = False
+        self.slot = None
+
+
+class NotifyingQueue(queue.Queue):
+    """放入结果时通知消费方，替代定时轮询；连续放入的结果只通知一次
+
+    通知在单独的线程中发出：从其他线程调用event_generate会等待界面线程处理，
+    直接在事件循环线程中调用时，界面线程等待事件循环（如关闭窗口时）就会死锁。
+    """
+
+    def __init__(self, notify=None):
+        super().__init__()
+        self.notify = None
+        self.notify_lock = threading.Lock()
+        self.notified_at = None
+        self.delivery_latency = 0
+        self.wake = threading.Event()
+        self.notifier = None
+        self.set_notify(notify)
+
+    def set_notify(self, notify):
+        """设置或清除通知回调，首次设置时启动通知线程"""
+        with self.notify_lock:
+            self.notify = notify
+            if notify is not None and self.notifier is None:
+                self.notifier = threading.Thread(target=self.run_notifier, name="queue-notifier", daemon=True)
+                self.notifier.start()
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        with self.notify_lock:
+            if self.notify is None or self.notified_at is not None:
+                return
+            self.notified_at = time.perf_counter()
+        self.wake.set()
+
+    def run_notifier(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            notify = self.notify
+            if notify is None:
+                continue
+            try:
+                notify()
+            except (RuntimeError, tk.TclError):
+                # 窗口已关闭
+                pass
+
+    def drain(self):
+        """取出当前全部结果；先清除通知标记，之后放入的结果会再次通知"""
+        with self.notify_lock:
+            if self.notified_at is not None:
+                self.delivery_latency = time.perf_counter() - self.notified_at
+            self.notified_at = None
+        items = []
+        while True:
+            try:
+                items.append(self.get_nowait())
+            except queue.Empty:
+                return items
+
+
 class DanbooruScraper:
-    def __init__(self, base_url="https://safebooru.donmai.us"):
+    def __init__(self, base_url="https://safebooru.donmai.us", load_async=False):
         self.base_url = base_url
         self.browser_manager = BrowserManager()
         self.user_agent = None
         self.cookies = {}
-        self.session = requests.Session()
-        self.queue = queue.Queue()
+        self.queue = NotifyingQueue()
+        self.rate_limiter = RateLimiter(REQUEST_RATE, REQUEST_BURST)
+        self.engine = AsyncFetchEngine(self.rate_limiter)
+        self.fetch_mode = FETCH_MODE
+        self.html_parser = HTML_PARSER
+        self.negative_cache_ttl = NEGATIVE_CACHE_TTL
+        self.stale_after = STALE_AFTER
+        self.revalidate_interval = REVALIDATE_INTERVAL
+        self.interactive_count = 0
+        self.identity_refreshing = set()
+        self.prefetch_depth = PREFETCH_DEPTH
+        self.prefetch_budget = PREFETCH_BUDGET
+        self.prefetch_queue = None  # 在事件循环中创建
+        self.prefetch_pending = set()
+        self.prefetch_counter = itertools.count()
+        self.prefetch_task = None
+        self.inflight = {}  # 正在抓取的标签，相同标签的并发查询共用一次请求；只在事件循环中访问
+        self.apply_cached_identity(self.base_url)
+        self.lock = threading.RLock()
         self.data_file = 'tag_data.json'
-        self.tag_data = self.load_data()
-        self.build_spelling_index()  # 初始化时构建拼写索引
+        self.db_file = 'tag_data.db'
+        self.store = TagStore(self.db_file)
+        # 修改先写入日志文件，由后台线程合并写入数据库；上次未写完的修改在这里补上
+        self.journal_file = 'tag_data.journal'
+        self.journal = TagJournal(self.store, self.journal_file, on_flushed=self.release_flushed)
+        replayed = self.journal.replay()
+        if replayed:
+            print(f"已从日志恢复 {replayed} 条未保存的修改")
+        self.journal.start()
+        # 数据库加载完成前，索引只包含已读取的部分记录
+        self.ready = threading.Event()
+        self.tag_data = {}
+        self.spelling_index = SpellingIndex()
+        self.search_index = TrigramIndex()
+        self.completion_index = PrefixTrie()
+        if not load_async:
+            self.load_database()
+
+    def migrate_data(self):
+        # 首次启动时把旧版JSON数据迁移到SQLite
+        migrated = self.store.migrate_json(self.data_file)
+        if migrated:
+            print(f"已从 {self.data_file} 迁移 {migrated} 条标签记录")
 
     def load_data(self):
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
+        self.migrate_data()
+        try:
+            return self.store.load_all()
+        except sqlite3.Error as e:
+            print(f"读取数据库失败: {e}")
+            return {}
+
+    def load_database(self, progress=None):
+        """分批读取数据库并增量建立索引，每批完成后调用progress(已加载数, 总数)"""
+        start = time.perf_counter()
+        try:
+            self.migrate_data()
+            total = self.store.count()
+            loaded = 0
+            for batch in self.store.iter_records():
+                with self.lock:
+                    for tag_info in batch:
+                        self.add_loaded_record(tag_info)
+                loaded += len(batch)
+                if progress:
+                    progress(loaded, total)
+        except sqlite3.Error as e:
+            print(f"读取数据库失败: {e}")
+        finally:
+            metrics.observe('store.load', time.perf_counter() - start)
+            self.ready.set()
+
+    def reload_data(self, progress=None):
+        """清空内存数据后重新加载；重建期间的查询直接读数据库"""
+        self.journal.flush()
+        with self.lock:
+            self.ready.clear()
+            self.tag_data = {}
+            self.spelling_index = SpellingIndex()
+            self.search_index = TrigramIndex()
+            self.completion_index = PrefixTrie()
+        self.load_database(progress)
+
+    def import_tags(self, path, progress=None, batch_size=IMPORT_BATCH_SIZE):
+        """批量导入标签导出文件，写入完成后只重建一次内存索引"""
+        importer = TagImporter(self.store, self.process_dtext_content, batch_size)
+        # 先写入日志中的修改，避免之后覆盖导入的数据
+        self.journal.flush()
+        counts = importer.import_file(path, progress)
+        # 尚未加载数据库时（如命令行导入）无需重建
+        if self.ready.is_set():
+            self.reload_data()
+        return counts
+
+    def start_loading(self, progress=None, done=None):
+        """在后台线程中加载数据库，界面无需等待"""
+        def run():
+            self.load_database(progress)
+            if done:
+                done()
+
+        thread = threading.Thread(target=run, name="db-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def add_loaded_record(self, tag_info):
+        # 加载期间已被重新抓取或单独读取的记录更新，跳过数据库中的旧版本
+        tag_key = tag_info['tag']
+        if tag_key in self.tag_data:
+            return
+        # 正文只用于建立拼写索引，不常驻内存
+        self.tag_data[tag_key] = TagRecord.from_dict(tag_info, self.store, with_body=False)
+        self.spelling_index.add_record(tag_info)
+        self.search_index.update(tag_key, tag_info)
+        self.update_completion_index(tag_key, None, tag_info)
+
+    def get_record(self, tag_key):
+        """取得本地记录，数据库尚未加载完时直接从数据库读取"""
+        record = self.tag_data.get(tag_key)
+        if record is None and not self.ready.is_set():
+            record = self.store.get(tag_key)
+            if record is not None:
+                with self.lock:
+                    self.add_loaded_record(record)
+                    record = self.tag_data[tag_key]
+        return record
+
+    def save_data(self, tag_key=None):
+        """保存指定标签；未指定时直接写入全部记录"""
+        if tag_key is None:
+            self.journal.flush()
+            records = list(self.tag_data.values())
+            self.store.upsert_many(records)
+            for record in records:
+                record.release_body()
+        elif tag_key in self.tag_data:
+            # 只追加到日志，数据库由后台线程写入，正文在写入后释放
+            with metrics.timed('store.save'):
+                self.journal.append(self.tag_data[tag_key].to_dict())
+
+    def release_flushed(self, flushed):
+        with self.lock:
+            for tag_key in flushed:
+                record = self.tag_data.get(tag_key)
+                if record is not None and not self.journal.is_pending(tag_key):
+                    record.release_body()
+
+    def close(self):
+        self.journal.close()
+        self.engine.close()
+
+    def put_tag(self, tag_key, tag_info):
+        """写入一条记录并增量更新索引"""
+        with self.lock:
+            old_info = self.tag_data.get(tag_key)
+            if old_info:
+                # 重新抓取的记录不含翻译，保留本地已有的翻译
+                for field in ['tag_translation', 'meaning_translation']:
+                    if not tag_info.get(field) and old_info.get(field):
+                        tag_info[field] = old_info[field]
+            self.tag_data[tag_key] = TagRecord.from_dict(tag_info, self.store)
+            self.spelling_index.replace_record(old_info, tag_info)
+            self.search_index.update(tag_key, tag_info)
+            self.update_completion_index(tag_key, old_info, tag_info)
+            # 在锁内写日志，避免后台写入线程释放尚未记录的正文
+            self.save_data(tag_key)
+
+    def remove_tag(self, tag_key):
+        """从内存、索引和数据库中删除一条记录"""
+        # 先写入日志中的修改，避免之后把删除的记录写回数据库；需在持有self.lock之前调用
+        self.journal.flush()
+        with self.lock:
+            old_info = self.tag_data.pop(tag_key, None)
+            if old_info is not None:
+                self.spelling_index.remove_record(old_info)
+                self.search_index.remove(tag_key)
+                self.update_completion_index(tag_key, old_info, None)
+            self.journal.discard(tag_key)
+            self.store.delete(tag_key)
+        return old_info is not None
+
+    def is_disposable(self, record):
+        """记录没有翻译，且来自带缓存校验头的wiki页面（导入的记录没有），页面不存在时可以删除"""
+        if record.get('tag_translation') or record.get('meaning_translation'):
+            return False
+        return bool(record.get('etag') or record.get('last_modified'))
+
+    def remove_missing_tag(self, tag_key, status_code):
+        """页面已不存在：删除本地记录，并记为不存在，之后的查询不再请求网络"""
+        self.remove_tag(tag_key)
+        status_msg = f"无法获取标签信息: {tag_key}\nHTTP状态码: {status_code}"
+        self.store.put_negative(self.base_url, self.negative_key(tag_key), status_code,
+                                status_msg, self.generate_suggestion_url(tag_key))
+
+    def parse_prompt_tags(self, text):
+        """把逗号或换行分隔的提示词拆成去重后的标签列表"""
+        tags = []
+        seen = set()
+        for part in re.split(r'[,\n]', text):
+            tag = part.strip().strip('()[]{}').strip()
+            # 去掉权重写法，如 (long hair:1.2)
+            tag = re.sub(r':\s*[\d.]+$', '', tag).strip()
+            if not tag:
+                continue
+            normalized = tag.replace(' ', '_')
+            if normalized not in seen:
+                seen.add(normalized)
+                tags.append(tag)
+        return tags
+
+    def get_tags_info(self, tags):
+        """批量查询标签：缓存命中立即返回，未命中的在事件循环中并发获取，每完成一个就放入队列"""
+        return self.engine.submit(self.batch_lookup_async(tags))
+
+    async def batch_lookup_async(self, tags):
+        total = len(tags)
+        progress = {'done': 0, 'failed': 0}
+
+        def report(tag, result):
+            progress['done'] += 1
+            if result['status'] != 'success':
+                progress['failed'] += 1
+            self.queue.put({
+                'status': 'batch_item',
+                'tag': tag,
+                'item': result,
+                'done': progress['done'],
+                'total': total
+            })
+
+        semaphore = asyncio.Semaphore(BATCH_WORKERS)
+
+        async def fetch(tag):
+            async with semaphore:
+                try:
+                    result = await self.lookup_tag_async(tag)
+                except Exception as e:
+                    result = {'status': 'error', 'message': f"无法获取标签信息: {tag}\n{e}"}
+            report(tag, result)
+
+        misses = []
+        for tag in tags:
+            record = self.get_record(tag.replace(' ', '_'))
+            if record is not None:
+                report(tag, {'status': 'success', 'result': record})
+            else:
+                misses.append(tag)
 
-    def save_data(self):
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.tag_data, f, ensure_ascii=False, indent=2)
-        self.build_spelling_index()  # 保存后更新索引
+        await asyncio.gather(*(fetch(tag) for tag in misses))
+        self.queue.put({'status': 'batch_done', 'total': total, 'failed': progress['failed']})
 
     def get_tag_info(self, tag):
-        normalized_tag = tag.replace(' ', '_')
-        tag_key = normalized_tag
+        """同步查询并把结果放入队列，界面已改用submit_tag_info，仅供基准测试使用"""
+        self.queue.put(self.lookup_tag(tag))
 
-        if tag_key in self.tag_data:
-            self.queue.put({
+    def submit_tag_info(self, tag):
+        """在后台事件循环中查询标签，结果放入队列，不阻塞调用方"""
+        return self.engine.submit(self.get_tag_info_async(tag))
+
+    async def get_tag_info_async(self, tag):
+        self.queue.put(await self.lookup_tag_async(tag))
+
+    def cached_result(self, tag):
+        record = self.get_record(tag.replace(' ', '_'))
+        if record is not None:
+            return {
                 'status': 'success',
-                'result': self.tag_data[tag_key]
-            })
+                'result': record
+            }
+        return None
+
+    def lookup_tag(self, tag):
+        """查询单个标签，返回结果消息"""
+        return self.engine.run(self.lookup_tag_async(tag))
+
+    def negative_key(self, tag):
+        return tag.strip().replace(' ', '_').lower()
+
+    def negative_result(self, tag):
+        """已知不存在的标签直接返回上次的结果，不再请求网络"""
+        entry = self.store.get_negative(self.base_url, self.negative_key(tag), self.negative_cache_ttl)
+        if entry is None:
+            return None
+        result = {
+            'status': 'error',
+            'message': entry['message'],
+            'cached': True
+        }
+        if entry['suggestion_url']:
+            result['suggestion_url'] = entry['suggestion_url']
+        return result
+
+    async def lookup_tag_async(self, tag, interactive=True, depth=0, budget=None):
+        """查询标签；depth为该页面距用户查询的层数，预取共享同一个budget"""
+        cached = self.cached_result(tag)
+        if cached:
+            metrics.incr('lookup.cache_hit')
+            return cached
+
+        negative = self.negative_result(tag)
+        if negative:
+            metrics.incr('lookup.negative_hit')
+            return negative
+
+        # 同一标签已在抓取时等待同一个结果，不重复请求
+        key = self.negative_key(tag)
+        task = self.inflight.get(key)
+        if task is not None:
+            metrics.incr('lookup.coalesced')
+            return await asyncio.shield(task)
+
+        # 交互查询进行中时后台任务暂停发请求
+        if interactive:
+            self.interactive_count += 1
+        task = self.inflight[key] = asyncio.ensure_future(self.fetch_tag_async(tag))
+        try:
+            with metrics.timed('lookup.fetch' if interactive else 'lookup.prefetch'):
+                result = await asyncio.shield(task)
+        finally:
+            if self.inflight.get(key) is task:
+                del self.inflight[key]
+            if interactive:
+                self.interactive_count -= 1
+
+        if result['status'] == 'success':
+            self.schedule_prefetch(result['result'].get('links'), depth + 1, budget)
+        return result
+
+    async def fetch_tag_async(self, tag):
+        if self.fetch_mode == 'json':
+            result = await self.lookup_tag_json_async(tag)
+            if result is not None:
+                return result
+
+        # JSON接口不可用时回退到解析网页
+        url = self.wiki_page_url(tag.replace(' ', '_'))
+        response = await self.safe_request_async(url)
+        # 页面解析比较耗时，放到线程池中避免阻塞事件循环
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.handle_tag_response, tag, url, response)
+
+    def schedule_prefetch(self, links, depth, budget=None):
+        """把页面中尚未缓存的链接排入预取队列，浅层链接优先；需在事件循环中调用"""
+        if not links or depth > self.prefetch_depth:
             return
+        if budget is None:
+            budget = {'left': self.prefetch_budget}
+        if self.prefetch_queue is None:
+            self.prefetch_queue = asyncio.PriorityQueue()
+        for tag_key in links:
+            if tag_key in self.prefetch_pending or tag_key in self.tag_data:
+                continue
+            self.prefetch_pending.add(tag_key)
+            self.prefetch_queue.put_nowait((depth, next(self.prefetch_counter), tag_key, budget))
+        if self.prefetch_task is None:
+            self.prefetch_task = asyncio.ensure_future(self.prefetch_loop())
+
+    async def prefetch_loop(self):
+        while True:
+            depth, _, tag_key, budget = await self.prefetch_queue.get()
+            try:
+                if budget['left'] <= 0 or self.get_record(tag_key) is not None or self.negative_result(tag_key):
+                    continue
+                # 交互查询优先，并且令牌桶装满时才发请求，给用户的查询留出余量
+                await self.wait_for_idle()
+                while self.rate_limiter.available() < self.rate_limiter.capacity:
+                    await asyncio.sleep(1 / self.rate_limiter.rate)
+                await self.wait_for_idle()
+                budget['left'] -= 1
+                await self.lookup_tag_async(tag_key, interactive=False, depth=depth, budget=budget)
+            except Exception as e:
+                print(f"预取标签失败: {tag_key} {e}")
+            finally:
+                self.prefetch_pending.discard(tag_key)
+
+    async def wait_for_idle(self):
+        """等待交互查询全部完成，后台任务借此让路"""
+        while self.interactive_count:
+            await asyncio.sleep(0.2)
+
+    def start_revalidation(self):
+        """启动后台重新验证任务"""
+        return self.engine.submit(self.revalidation_loop())
+
+    async def revalidation_loop(self):
+        while True:
+            await asyncio.sleep(self.revalidate_interval)
+            try:
+                await self.revalidate_stale()
+            except Exception as e:
+                print(f"重新验证失败: {e}")
+
+    async def revalidate_stale(self, limit=REVALIDATE_BATCH):
+        """对过期条目逐个发送条件请求，返回处理结果计数"""
+        cutoff = time.time() - self.stale_after
+        counts = {'not_modified': 0, 'updated': 0, 'missing': 0, 'removed': 0, 'failed': 0}
+        # 过期条目按数据库中的抓取时间挑选，先写入日志中的修改
+        await asyncio.get_running_loop().run_in_executor(None, self.journal.flush)
+        for tag_key in self.store.stale_tags(cutoff, limit):
+            await self.wait_for_idle()
+            outcome = await self.revalidate_tag_async(tag_key)
+            counts[outcome or 'failed'] += 1
+        return counts
+
+    async def revalidate_tag_async(self, tag_key):
+        """用ETag/Last-Modified发送条件请求，未修改时只刷新抓取时间"""
+        record = self.get_record(tag_key)
+        if record is None:
+            return None
+
+        headers = {}
+        if record.get('etag'):
+            headers['If-None-Match'] = record['etag']
+        if record.get('last_modified'):
+            headers['If-Modified-Since'] = record['last_modified']
+
+        tags_response = None
+        if self.fetch_mode == 'json':
+            wiki_url, tags_url = self.api_urls(tag_key)
+            response, tags_response = await asyncio.gather(
+                self.safe_request_async(wiki_url, headers),
+                self.safe_request_async(tags_url))
+        else:
+            response = await self.safe_request_async(self.wiki_page_url(tag_key), headers)
+
+        if response is None:
+            return None
+
+        loop = asyncio.get_running_loop()
+        if response.status_code in NEGATIVE_CACHE_STATUSES:
+            if self.is_disposable(record):
+                # 从wiki页面抓取、没有用户数据的记录随页面一起删除
+                await loop.run_in_executor(None, self.remove_missing_tag, tag_key, response.status_code)
+                return 'removed'
+            # 有翻译或来自导入的记录（多数标签没有wiki页面）保留，只刷新抓取时间，下次过期再检查
+            posts = self.parse_posts_count(tags_response, record.get('posts', 0))
+            await loop.run_in_executor(
+                None, self.put_tag, tag_key, dict(record.to_dict(), fetched_at=time.time(), posts=posts))
+            return 'missing'
+
+        if response.status_code == 304:
+            # 内容未变时保留原记录，只更新抓取时间和作品数
+            posts = self.parse_posts_count(tags_response, record.get('posts', 0))
+            await loop.run_in_executor(
+                None, self.put_tag, tag_key, dict(record.to_dict(), fetched_at=time.time(), posts=posts))
+            return 'not_modified'
+
+        if response.status_code != 200:
+            return None
+
+        if self.fetch_mode == 'json':
+            wiki_page = self.parse_wiki_json(response)
+            if wiki_page is None:
+                return None
+            posts = self.parse_posts_count(tags_response, record.get('posts', 0))
+            tag_info = await loop.run_in_executor(
+                None, self.build_tag_info_from_json, tag_key, wiki_page, posts, response.headers)
+        else:
+            tag_info = await loop.run_in_executor(None, self.parse_wiki_page, tag_key, response)
+        if tag_info is None:
+            return None
+
+        await loop.run_in_executor(None, self.put_tag, tag_key, tag_info)
+        return 'updated'
+
+    def wiki_page_url(self, normalized_tag):
+        # 标签可能含有括号、撇号、斜杠等字符，需转义后再放入路径
+        return f"{self.base_url}/wiki_pages/{quote(normalized_tag, safe='')}"
+
+    def api_urls(self, normalized_tag):
+        wiki_url = f"{self.base_url}/wiki_pages/{quote(normalized_tag, safe='')}.json"
+        tags_url = f"{self.base_url}/tags.json?search[name]={quote(normalized_tag, safe='')}&only=name,post_count"
+        return wiki_url, tags_url
+
+    def parse_posts_count(self, tags_response, default=0):
+        """从tags.json取作品数；请求失败或无法解析时返回default，标签不存在时为0"""
+        if tags_response is None or tags_response.status_code != 200:
+            return default
+        try:
+            tags = json.loads(tags_response.text)
+            if not tags:
+                return 0
+            return int(tags[0].get('post_count', 0))
+        except (ValueError, TypeError, AttributeError, IndexError):
+            return default
+
+    def parse_wiki_json(self, wiki_response):
+        try:
+            wiki_page = json.loads(wiki_response.text)
+        except ValueError:
+            return None
+        if not isinstance(wiki_page, dict) or 'body' not in wiki_page:
+            return None
+        return wiki_page
+
+    async def lookup_tag_json_async(self, tag):
+        """通过wiki_pages.json和tags.json获取标签；接口无响应或返回无法解析的内容时返回None，改用网页"""
+        normalized_tag = tag.replace(' ', '_')
+        wiki_url, tags_url = self.api_urls(normalized_tag)
+
+        (wiki_response, challenged), tags_response = await asyncio.gather(
+            self.checked_request_async(wiki_url),
+            self.safe_request_async(tags_url))
+        loop = asyncio.get_running_loop()
+
+        if challenged or (wiki_response is not None and wiki_response.status_code != 200):
+            # 验证页面、限流、服务器错误和不存在都直接报告，不再请求网页加重负担
+            return await loop.run_in_executor(None, self.tag_error, tag, wiki_response)
+        if wiki_response is None:
+            return None
+
+        wiki_page = self.parse_wiki_json(wiki_response)
+        if wiki_page is None:
+            return None
+        if wiki_page.get('is_deleted'):
+            return {'status': 'error', 'message': f"未找到标签信息: {tag}"}
+
+        # tags.json失败时保留已有的作品数，没有已有记录时不写入0，以免影响按作品数排序
+        record = self.get_record(normalized_tag)
+        posts_count = self.parse_posts_count(tags_response, record.get('posts', 0) if record else None)
+        if posts_count is None:
+            status = tags_response.status_code if tags_response is not None else "无响应"
+            return {'status': 'error', 'message': f"无法获取标签作品数: {tag}\nHTTP状态码: {status}"}
+        return await loop.run_in_executor(
+            None, self.handle_wiki_json, normalized_tag, wiki_page, posts_count, wiki_response.headers)
+
+    def build_tag_info_from_json(self, normalized_tag, wiki_page, posts_count, headers):
+        with metrics.timed('parse.dtext'):
+            meaning, content = self.process_dtext_content(wiki_page.get('body') or '')
+        synonyms = [name.strip().replace(' ', '_') for name in wiki_page.get('other_names') or []]
+        links = self.extract_dtext_links(wiki_page.get('body') or '')
+
+        return {
+            'tag': normalized_tag,
+            'tag_translation': "",
+            'synonyms': ", ".join(synonyms),
+            'meaning': meaning,
+            'meaning_translation': "",
+            'sections': content,
+            'posts': posts_count,
+            'fetched_at': time.time(),
+            'etag': headers.get('ETag', ''),
+            'last_modified': headers.get('Last-Modified', ''),
+            'links': links  # 只用于预取，不写入数据库
+        }
 
-        url = f"{self.base_url}/wiki_pages/{normalized_tag}"
-        response = self.safe_request(url)
+    def handle_wiki_json(self, normalized_tag, wiki_page, posts_count, headers):
+        tag_info = self.build_tag_info_from_json(normalized_tag, wiki_page, posts_count, headers)
+        self.put_tag(normalized_tag, tag_info)
+        # 页面已存在，之前记下的“不存在”作废
+        self.store.delete_negative(self.base_url, self.negative_key(normalized_tag))
 
-        # 检测所有类型的错误（包括无响应）
-        if not response or response.status_code != 200:
-            # 总是生成建议链接，即使没有响应
-            suggestion_url = self.generate_suggestion_url(tag)
+        return {
+            'status': 'success',
+            'result': tag_info
+        }
 
-            status_msg = f"无法获取标签信息: {tag}"
-            if response:
-                status_msg += f"\nHTTP状态码: {response.status_code}"
-            else:
-                status_msg += "\nHTTP状态码: 无响应"
+    def tag_error(self, tag, response):
+        """生成查询失败的结果，明确不存在的标签写入负缓存"""
+        # 总是生成建议链接，即使没有响应
+        suggestion_url = self.generate_suggestion_url(tag)
 
-            self.queue.put({
-                'status': 'error',
-                'message': status_msg,
-                'suggestion_url': suggestion_url
-            })
-            return
+        status_msg = f"无法获取标签信息: {tag}"
+        if response:
+            status_msg += f"\nHTTP状态码: {response.status_code}"
+        else:
+            status_msg += "\nHTTP状态码: 无响应"
 
-        if not response or response.status_code != 200:
-            self.queue.put({'status': 'info', 'message': '正在获取浏览器信息，请稍候...'})
-            user_agent, cookies = self.browser_manager.get_user_agent_cookies(url)
+        # 只缓存明确的“不存在”，网络错误和限流下次仍然重试
+        if response and response.status_code in NEGATIVE_CACHE_STATUSES:
+            self.store.put_negative(self.base_url, self.negative_key(tag), response.status_code,
+                                    status_msg, suggestion_url)
 
-            if user_agent and cookies:
-                self.user_agent = user_agent
-                self.cookies = cookies
-                self.session.headers.update({'User-Agent': self.user_agent})
-                response = self.safe_request(url)
+        return {
+            'status': 'error',
+            'message': status_msg,
+            'suggestion_url': suggestion_url
+        }
 
+    def handle_tag_response(self, tag, url, response):
+        normalized_tag = tag.replace(' ', '_')
+        tag_key = normalized_tag
+
+        # 被拦截时换用缓存的浏览器身份重试一次，不在查询路径上启动浏览器
+        if response is None and self.apply_cached_identity(url):
+            response = self.safe_request(url)
+
+        # 检测所有类型的错误（包括无响应）
         if not response or response.status_code != 200:
-            self.queue.put({
-                'status': 'error',
-                'message': f"无法获取标签信息: {tag}\nHTTP状态码: {response.status_code if response else '无响应'}"
-            })
-            return
+            return self.tag_error(tag, response)
+
+        tag_info = self.parse_wiki_page(normalized_tag, response)
+        if tag_info is None:
+            return {'status': 'error', 'message': f"未找到标签信息: {tag}"}
+
+        self.put_tag(tag_key, tag_info)
+        self.store.delete_negative(self.base_url, self.negative_key(tag))
+
+        return {
+            'status': 'success',
+            'result': tag_info
+        }
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+    def parse_wiki_page(self, normalized_tag, response):
+        """解析wiki网页，页面中没有正文时返回None"""
+        with metrics.timed('parse.html'):
+            soup = BeautifulSoup(response.text, self.html_parser)
 
         # 提取Posts数字
         posts_element = soup.find('a', id='subnav-posts')
@@ -182,8 +2420,7 @@ class DanbooruScraper:
 
         wiki_body = soup.find('div', id='wiki-page-body')
         if not wiki_body:
-            self.queue.put({'status': 'error', 'message': f"未找到标签信息: {tag}"})
-            return
+            return None
 
         content = self.process_wiki_content(wiki_body)
 
@@ -192,7 +2429,7 @@ class DanbooruScraper:
             if element.name in ['h4', 'h5', 'h6']:
                 break
             if element.name == 'p':
-                meaning += self.convert_html_to_text(str(element)) + "\n\n"
+                meaning += self.convert_element_to_text(element) + "\n\n"
 
         tag_info = {
             'tag': normalized_tag,
@@ -201,16 +2438,41 @@ class DanbooruScraper:
             'meaning': meaning.strip(),
             'meaning_translation': "",
             'sections': content,
-            'posts': posts_count  # 新增字段
+            'posts': posts_count,  # 新增字段
+            'fetched_at': time.time(),
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', ''),
+            'links': self.extract_wiki_links(wiki_body)  # 只用于预取，不写入数据库
         }
-
-        self.tag_data[tag_key] = tag_info
-        self.save_data()
-
-        self.queue.put({
-            'status': 'success',
-            'result': tag_info
-        })
+        return tag_info
+
+    # 指向帮助、分组等非标签页面的链接不预取
+    WIKI_LINK_NAMESPACES = ('help:', 'howto:', 'about:', 'tag_group:', 'pool_group:', 'api:')
+    DTEXT_WIKI_LINK = re.compile(r'\[\[([^\]|]+)(?:\|[^\]]*)?\]\]')
+
+    def extract_wiki_links(self, wiki_body):
+        """提取wiki网页正文中指向其他wiki页面的链接"""
+        names = []
+        for a in wiki_body.select('a[href^="/wiki_pages/"]'):
+            parts = urlsplit(a['href'])
+            # 带查询参数的是尚未创建的页面
+            if not parts.query:
+                names.append(unquote(parts.path[len('/wiki_pages/'):]))
+        return self.unique_links(names)
+
+    def extract_dtext_links(self, body):
+        """提取DText中 [[标签]] 和 [[标签|文字]] 形式的链接"""
+        return self.unique_links(match.group(1) for match in self.DTEXT_WIKI_LINK.finditer(body))
+
+    def unique_links(self, names):
+        links = []
+        seen = set()
+        for name in names:
+            link = name.split('#')[0].strip().lower().replace(' ', '_')
+            if link and not link.startswith(self.WIKI_LINK_NAMESPACES) and link not in seen:
+                seen.add(link)
+                links.append(link)
+        return links
 
     def generate_suggestion_url(self, tag):
         """生成可能的正确标签建议URL"""
@@ -228,16 +2490,16 @@ class DanbooruScraper:
 
             # 检查本地缓存
             if normalized in self.tag_data:
-                return f"{self.base_url}/wiki_pages/{normalized}"
+                return self.wiki_page_url(normalized)
 
             # 检查拼写修正是否在索引中
             if suggestion in self.spelling_index:
-                return f"{self.base_url}/wiki_pages/{normalized}"
+                return self.wiki_page_url(normalized)
 
         # 如果没有找到，返回最可能的建议
         if suggestions:
             normalized = suggestions[0].replace(' ', '_')
-            return f"{self.base_url}/wiki_pages/{normalized}"
+            return self.wiki_page_url(normalized)
 
         # 默认返回基础URL
         return f"{self.base_url}/wiki_pages/"
@@ -280,98 +2542,239 @@ class DanbooruScraper:
 
         return list(set(suggestions))  # 去重
 
-    def convert_html_to_text(self, html_content):
-        """将HTML内容转换为格式化的纯文本，正确处理嵌套列表"""
-        if not html_content:
-            return ""
+    def convert_element_to_text(self, element):
+        """直接遍历已解析的节点树转换为纯文本，不再序列化后重新解析
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-        # 移除所有不需要的标签
-        for tag in soup(['script', 'style', 'noscript']):
-            tag.decompose()
+        使用显式栈代替递归，所有输出写入同一个缓冲区。列表项缩进、
+        空白合并规则与逐层拼接字符串的旧实现保持一致。
+        """
+        buffer = []
+        root = HtmlTextFrame(iter((element,)), 'text', 0)
+        stack = [root]
+
+        while stack:
+            frame = stack[-1]
+            child = next(frame.children, None)
+            if child is None:
+                stack.pop()
+                if stack:
+                    self.finish_text_frame(frame, stack[-1], buffer)
+                continue
 
-        # 处理根节点
-        return self.process_node(soup, level=0).strip()
+            name = child.name
+            if name is None:
+                # 文本节点，列表容器中的文本会被忽略
+                if frame.mode != 'list':
+                    self.write_text_part(frame, str(child), buffer)
+                continue
+            if name in HTML_SKIP_TAGS:
+                continue
+            if frame.mode == 'list' and name not in ['li', 'ul', 'ol']:
+                continue
 
-    def process_node(self, node, level=0):
-        """递归处理节点及其子节点"""
-        if isinstance(node, str):
-            # 处理文本节点 - 保留原始空白
-            return node
+            if name == 'a':
+                # 处理超链接 - 只提取文本，包含图片时返回空
+                self.write_text_part(frame, "" if child.find('img') else child.get_text(strip=False), buffer)
+            elif name == 'br':
+                self.write_text_part(frame, "\n", buffer)
+            elif name in ['ul', 'ol']:
+                stack.append(self.start_text_frame(child, 'list', frame.child_level, frame, buffer))
+            elif name == 'li':
+                stack.append(self.start_text_frame(child, 'item', frame.child_level, frame, buffer))
+            elif name in ['h4', 'h5', 'h6', 'p', 'div']:
+                # 块级元素总有输出，分隔符和前导换行可以直接写入
+                if frame.has_output:
+                    buffer.append(frame.separator)
+                frame.has_output = True
+                buffer.append("\n\n")
+                stack.append(HtmlTextFrame(iter(child.children), 'block', 0))
+            else:
+                stack.append(self.start_text_frame(child, 'text', 0, frame, buffer))
+
+        return "".join(buffer).strip()
+
+    def start_text_frame(self, node, mode, level, parent, buffer):
+        # 子节点是否有输出要等处理完才知道，先为分隔符（列表项还有缩进）占位
+        frame = HtmlTextFrame(iter(node.children), mode, level)
+        frame.slot = len(buffer)
+        buffer.append("")
+        if mode == 'item':
+            frame.child_level = level + 1
+            buffer.append("")
+        return frame
+
+    def write_text_part(self, frame, text, buffer):
+        if not text:
+            return
+        if frame.has_output:
+            buffer.append(frame.separator)
+        buffer.append(text)
+        frame.has_output = True
+
+    def finish_text_frame(self, frame, parent, buffer):
+        if frame.mode == 'block':
+            buffer.append("\n\n")
+            return
 
-        if node.name == 'a':
-            # 处理超链接 - 只提取文本
-            return self.process_link(node)
+        if frame.mode == 'item' and frame.has_output:
+            # 列表项内容去除首尾空白后再加缩进
+            start = frame.slot + 2
+            i = start
+            while i < len(buffer):
+                buffer[i] = buffer[i].lstrip()
+                if buffer[i]:
+                    break
+                i += 1
+            j = len(buffer) - 1
+            while j >= i:
+                buffer[j] = buffer[j].rstrip()
+                if buffer[j]:
+                    break
+                j -= 1
+            frame.has_output = j >= i
+            if frame.has_output:
+                buffer[frame.slot + 1] = "  " * frame.level
+
+        if not frame.has_output:
+            del buffer[frame.slot:]
+            return
 
-        # 处理列表容器
-        if node.name in ['ul', 'ol']:
-            return self.process_list_container(node, level)
+        if parent.has_output:
+            buffer[frame.slot] = parent.separator
+        parent.has_output = True
+
+    DTEXT_HEADER = re.compile(r'^h([1-6])(?:#[\w-]+)?\.\s*(.*)$', re.IGNORECASE)
+    DTEXT_LIST_ITEM = re.compile(r'^(\*+)\s+(.*)$')
+    DTEXT_BLOCK_OPEN = re.compile(r'^\[(expand|quote|table|code|section)(?:[=\s][^\]]*)?\]', re.IGNORECASE)
+    DTEXT_INLINE = [
+        (re.compile(r'\[\[([^\]|]+)\|([^\]]*)\]\]'), r'\2'),
+        (re.compile(r'\[\[([^\]]+)\]\]'), r'\1'),
+        (re.compile(r'\{\{([^}|]+)\|([^}]*)\}\}'), r'\2'),
+        (re.compile(r'\{\{([^}]+)\}\}'), r'\1'),
+        (re.compile(r'"([^"]+)":\[[^\]]+\]'), r'\1'),
+        (re.compile(r'"([^"]+)":(?:https?://|/)[^\s\]]*[^\s\].,;:!?)]'), r'\1'),
+        (re.compile(r'\[url=[^\]]+\](.*?)\[/url\]', re.IGNORECASE), r'\1'),
+        (re.compile(r'<(https?://[^>]+)>'), r'\1'),
+        (re.compile(r'\[br\]', re.IGNORECASE), '\n'),
+        (re.compile(r'\[/?(?:b|i|u|s|tn|spoilers?|nodtext)\]', re.IGNORECASE), ''),
+    ]
+
+    def convert_dtext_to_text(self, dtext):
+        """将DText行内标记转换为纯文本"""
+        text = dtext
+        for pattern, replacement in self.DTEXT_INLINE:
+            text = pattern.sub(replacement, text)
+        return text.strip()
+
+    def split_dtext_blocks(self, body):
+        """把DText正文拆分为标题、段落和列表块"""
+        blocks = []
+        paragraph = []
+        items = []
+        skip_tag = None
+        skip_depth = 0
+
+        def flush():
+            if paragraph:
+                blocks.append(('p', "\n".join(paragraph)))
+                paragraph.clear()
+            if items:
+                blocks.append(('list', list(items)))
+                items.clear()
+
+        for line in body.replace('\r\n', '\n').split('\n'):
+            stripped = line.strip()
+
+            # 折叠块、引用、表格等在网页版中不属于段落或列表，整体跳过
+            if skip_tag:
+                lowered = stripped.lower()
+                if lowered.startswith(f'[{skip_tag}'):
+                    skip_depth += 1
+                if f'[/{skip_tag}]' in lowered:
+                    skip_depth -= 1
+                    if skip_depth == 0:
+                        skip_tag = None
+                continue
+            block_open = self.DTEXT_BLOCK_OPEN.match(stripped)
+            if block_open:
+                flush()
+                tag_name = block_open.group(1).lower()
+                if f'[/{tag_name}]' not in stripped.lower():
+                    skip_tag = tag_name
+                    skip_depth = 1
+                continue
 
-        # 处理列表项
-        if node.name == 'li':
-            return self.process_list_item(node, level)
+            if not stripped:
+                flush()
+                continue
+
+            header = self.DTEXT_HEADER.match(stripped)
+            if header:
+                flush()
+                blocks.append(('h' + header.group(1), self.convert_dtext_to_text(header.group(2))))
+                continue
 
-        # 处理特殊标签
-        if node.name in ['h4', 'h5', 'h6']:
-            return f"\n\n{self.get_node_text(node)}\n\n"
+            list_item = self.DTEXT_LIST_ITEM.match(stripped)
+            if list_item:
+                if paragraph:
+                    blocks.append(('p', "\n".join(paragraph)))
+                    paragraph.clear()
+                items.append((len(list_item.group(1)), list_item.group(2)))
+                continue
 
-        if node.name in ['p', 'div']:
-            return f"\n\n{self.get_node_text(node)}\n\n"
+            if items:
+                blocks.append(('list', list(items)))
+                items.clear()
+            paragraph.append(stripped)
 
-        if node.name == 'br':
-            return "\n"
+        flush()
+        return blocks
 
-        # 默认处理：递归处理所有子节点
-        return self.get_node_text(node)
+    def process_dtext_content(self, body):
+        """解析DText正文，返回与网页抓取相同结构的释义和章节"""
+        meaning = ""
+        sections = {}
+        current_section = None
+        current_content = []
+        in_header = False
 
-    def process_list_container(self, node, level):
-        """处理列表容器（ul/ol）"""
-        items = []
-        for child in node.children:
-            # 只处理直接子节点
-            if child.name in ['li', 'ul', 'ol']:
-                processed = self.process_node(child, level)
-                if processed:
-                    items.append(processed)
-
-        # 合并列表项
-        return "\n".join(items)
-
-    def process_list_item(self, node, level):
-        """处理列表项，支持嵌套"""
-        contents = []
-        for child in node.children:
-            # 递归处理子节点
-            processed = self.process_node(child, level + 1)
-            if processed:
-                contents.append(processed)
-
-        # 拼接内容并添加缩进
-        indent = "  " * level
-        content = " ".join(contents).strip()
-        return f"{indent}{content}" if content else ""
-
-    def get_node_text(self, node):
-        """获取节点的文本内容"""
-        parts = []
-        for child in node.children:
-            processed = self.process_node(child)
-            if processed:
-                parts.append(processed)
-
-        # 合并相邻文本
-        return " ".join(parts)
-
-    def process_link(self, node):
-        """处理超链接元素，返回纯文本"""
-        # 直接提取链接文本
-        text = node.get_text(strip=False)
-
-        # 如果链接包含图片，返回空
-        if node.find('img'):
-            return ""
-
-        return text
+        for kind, payload in self.split_dtext_blocks(body):
+            if kind in ['h4', 'h5', 'h6']:
+                in_header = True
+                section_title = payload
+
+                if "example" in section_title.lower():
+                    current_section = None
+                    current_content = []
+                    continue
+
+                if current_section:
+                    sections[current_section] = "\n".join(current_content)
+                    current_content = []
+                current_section = section_title
+                continue
+
+            if kind == 'p':
+                text_content = self.convert_dtext_to_text(payload)
+                if not in_header:
+                    meaning += text_content + "\n\n"
+            elif kind == 'list':
+                lines = []
+                for depth, item in payload:
+                    item_text = self.convert_dtext_to_text(item)
+                    if item_text:
+                        lines.append("  " * (depth - 1) + item_text)
+                text_content = "\n".join(lines)
+            else:
+                continue
+
+            if current_section and text_content:
+                current_content.append(text_content)
+
+        if current_section and current_content:
+            sections[current_section] = "\n".join(current_content)
+
+        return meaning.strip(), sections
 
     def process_wiki_content(self, wiki_body):
         sections = {}
@@ -392,7 +2795,7 @@ class DanbooruScraper:
                     current_content = []
                 current_section = section_title
             elif current_section and element.name in ['p', 'ul', 'ol']:
-                text_content = self.convert_html_to_text(str(element))
+                text_content = self.convert_element_to_text(element)
                 if text_content:
                     current_content.append(text_content)
 
@@ -401,119 +2804,180 @@ class DanbooruScraper:
 
         return sections
 
-    def safe_request(self, url, max_retries=2, delay=2):
-        for i in range(max_retries):
-            try:
-                sleep_time = delay + random.uniform(0, 1)
-                time.sleep(sleep_time)
-                response = self.session.get(url, cookies=self.cookies, timeout=15)
-                if "Just a moment" in response.text or "Cloudflare" in response.text:
-                    return None
-                return response
-            except (requests.RequestException, ConnectionError) as e:
-                print(f"请求失败 ({i + 1}/{max_retries}): {e}")
-                time.sleep(3)
-        return None
-
-    def search_db(self, query):
-        normalized_query = query.replace(' ', '_').lower()
-        fuzzy_query = normalized_query.replace('_', ' ')
-
-        results = []
-        for tag_key, data in self.tag_data.items():
-            tag_normalized = data['tag'].lower()
-            tag_standard = data['tag'].replace('_', ' ')
-
-            if (normalized_query in tag_normalized or
-                    fuzzy_query in tag_normalized or
-                    normalized_query in tag_standard or
-                    fuzzy_query in tag_standard):
-                results.append(data)
-                continue
-
-            if normalized_query in data.get('tag_translation', '').lower():
-                results.append(data)
-                continue
-
-            synonyms = data.get('synonyms', '').lower().replace(' ', '_')
-            if normalized_query in synonyms:
-                results.append(data)
-        return results
+    def safe_request(self, url):
+        return self.engine.run(self.safe_request_async(url))
+
+    async def safe_request_async(self, url, headers=None):
+        response, _ = await self.checked_request_async(url, headers)
+        return response
+
+    async def checked_request_async(self, url, headers=None):
+        """返回 (响应, 是否遇到验证页面)，遇到验证页面时响应为None"""
+        response = await self.engine.fetch(url, headers=headers, cookies=self.cookies)
+        if response is not None and ("Just a moment" in response.text or "Cloudflare" in response.text):
+            # 只有遇到验证页面才需要浏览器身份，超时和连接错误不触发刷新
+            metrics.incr('fetch.challenge')
+            self.request_identity_refresh(url)
+            return None, True
+        return response, False
+
+    def search_db(self, query, limit=None):
+        with metrics.timed('search.search_db'):
+            with self.lock:
+                tag_keys = self.search_index.search(query, limit)
+            if tag_keys is None or not self.ready.is_set():
+                # 单字符查询无法使用三元组索引，加载未完成时索引也不全，交给数据库扫描
+                # 先写入日志中的修改，刚抓取的标签才能被搜到；需在持有self.lock之外调用
+                try:
+                    self.journal.flush()
+                except (sqlite3.Error, OSError) as e:
+                    print(f"写入数据库失败: {e}")
+                tag_keys = self.store.search(query)[:limit]
+
+            results = []
+            for tag_key in tag_keys:
+                data = self.get_record(tag_key)
+                if data is not None:
+                    results.append(data)
+            return results
+
+    def autocomplete(self, query, limit=AUTOCOMPLETE_LIMIT):
+        """前缀补全按作品数排序，不足limit条时用子串匹配补齐"""
+        with metrics.timed('search.autocomplete'):
+            prefix = query.strip().replace(' ', '_').lower()
+            with self.lock:
+                tag_keys = self.completion_index.complete(prefix, limit)
+            results = [self.tag_data[tag_key] for tag_key in tag_keys if tag_key in self.tag_data]
+
+            if len(results) < limit:
+                seen = set(tag_keys)
+                for data in self.search_db(query, limit + len(seen)):
+                    if data['tag'] not in seen:
+                        results.append(data)
+                        if len(results) >= limit:
+                            break
+            return results
 
     def update_translation(self, tag, tag_translation, meaning_translation):
         tag_key = tag.replace(' ', '_')
-        if tag_key in self.tag_data:
-            self.tag_data[tag_key]['tag_translation'] = tag_translation
-            self.tag_data[tag_key]['meaning_translation'] = meaning_translation
-            self.save_data()
+        if self.get_record(tag_key) is not None:
+            with self.lock:
+                self.tag_data[tag_key]['tag_translation'] = tag_translation
+                self.tag_data[tag_key]['meaning_translation'] = meaning_translation
+                self.search_index.update(tag_key, self.tag_data[tag_key])
+                self.save_data(tag_key)
             return True
         return False
 
     def set_base_url(self, url):
         self.base_url = url
+        self.apply_cached_identity(url)
+
+    def apply_cached_identity(self, url):
+        """使用站点缓存的浏览器身份，身份有变化时返回True"""
+        user_agent, cookies = self.browser_manager.get_cached_identity(url)
+        if not user_agent or (user_agent == self.user_agent and cookies == self.cookies):
+            return False
+        self.user_agent = user_agent
+        self.cookies = cookies
+        self.engine.headers.update({'User-Agent': self.user_agent})
+        return True
+
+    def request_identity_refresh(self, url):
+        """在后台刷新浏览器身份，不等待结果"""
+        if not self.browser_manager.browser_path or self.browser_manager.backing_off(url):
+            return
+        self.browser_manager.mark_needed(url)
+        site = self.browser_manager.site_of(url)
+        if site in self.identity_refreshing:
+            return
+        self.identity_refreshing.add(site)
+        self.engine.submit(self.refresh_identity_async(url))
+
+    async def refresh_identity_async(self, url):
+        site = self.browser_manager.site_of(url)
+        self.identity_refreshing.add(site)
+        try:
+            # 浏览器启动是阻塞操作，放到线程池中执行
+            await asyncio.get_running_loop().run_in_executor(None, self.browser_manager.refresh_identity, url)
+            if site == self.browser_manager.site_of(self.base_url):
+                self.apply_cached_identity(url)
+        finally:
+            self.identity_refreshing.discard(site)
+
+    def start_identity_refresh(self):
+        """启动后台任务，启动后不久及过期前预热浏览器身份"""
+        if not self.browser_manager.browser_path:
+            return None
+        return self.engine.submit(self.identity_refresh_loop())
+
+    async def identity_refresh_loop(self):
+        await asyncio.sleep(IDENTITY_REFRESH_DELAY)
+        while True:
+            for site in list(self.browser_manager.identities):
+                if self.browser_manager.needs_refresh(site) and site not in self.identity_refreshing:
+                    await self.refresh_identity_async(site)
+            await asyncio.sleep(IDENTITY_CHECK_INTERVAL)
 
     def is_valid_tag(self, tag):
         pattern = r'^[a-zA-Z0-9_\-\.:]+$'
         return bool(re.match(pattern, tag))
 
     def build_spelling_index(self):
-        """构建拼写建议索引"""
-        self.spelling_index = set()
-
-        for tag_data in self.tag_data.values():
-            # 添加标签本身
-            self.spelling_index.add(tag_data['tag'].lower())
-
-            # 添加同义词
-            if tag_data.get('synonyms'):
-                for syn in tag_data['synonyms'].split(','):
-                    self.spelling_index.add(syn.strip().lower())
-
-            # 添加释义中的关键词
-            if tag_data.get('meaning'):
-                words = re.findall(r'\b\w+\b', tag_data['meaning'].lower())
-                self.spelling_index.update(words)
-
-            # 添加章节内容中的关键词
-            if tag_data.get('sections'):
-                for section in tag_data['sections'].values():
-                    words = re.findall(r'\b\w+\b', section.lower())
-                    self.spelling_index.update(words)
-
-        # 过滤掉过短的词汇
-        self.spelling_index = {word for word in self.spelling_index if len(word) > 3}
+        """全量重建拼写建议索引；加载和抓取时索引已增量维护，仅供基准测试计时使用"""
+        with metrics.timed('index.build_spelling'):
+            self.spelling_index = SpellingIndex()
+            for tag_data in self.tag_data.values():
+                self.spelling_index.add_record(tag_data)
+
+    def build_search_index(self):
+        """全量重建子串搜索索引和前缀补全索引；加载和抓取时索引已增量维护，仅供基准测试计时使用"""
+        with metrics.timed('index.build_search'):
+            self.search_index = TrigramIndex()
+            self.completion_index = PrefixTrie()
+            for tag_key, tag_data in self.tag_data.items():
+                self.search_index.update(tag_key, tag_data)
+                self.update_completion_index(tag_key, None, tag_data)
+
+    def completion_keys(self, tag_info):
+        keys = {tag_info['tag'].lower()}
+        if tag_info.get('synonyms'):
+            for syn in tag_info['synonyms'].split(','):
+                syn = syn.strip().lower().replace(' ', '_')
+                if syn:
+                    keys.add(syn)
+        return keys
+
+    def update_completion_index(self, tag_key, old_info, new_info):
+        if old_info:
+            for key in self.completion_keys(old_info):
+                self.completion_index.remove(key, tag_key)
+        if new_info:
+            posts = new_info.get('posts', 0) or 0
+            for key in self.completion_keys(new_info):
+                self.completion_index.insert(key, tag_key, posts)
 
     def find_closest_match(self, word):
         """使用编辑距离找到最接近的匹配"""
-        if not hasattr(self, 'spelling_index') or not self.spelling_index:
-            self.build_spelling_index()
-
-        word = word.lower()
-
-        # 如果是已知标签，直接返回
-        if word in self.spelling_index:
-            return word
-
-        # 计算编辑距离
-        min_distance = float('inf')
-        best_match = None
-
-        for candidate in self.spelling_index:
-            # 跳过完全包含的情况（如"girl"和"girls"）
-            if word in candidate or candidate in word:
-                continue
-
-            # 计算编辑距离
-            distance = self.levenshtein_distance(word, candidate)
-            if distance < min_distance:
-                min_distance = distance
-                best_match = candidate
-
-        # 如果编辑距离在可接受范围内
-        if best_match and min_distance <= min(3, len(word) // 2):
-            return best_match
-
-        return None
+        with metrics.timed('search.closest_match'):
+            word = word.lower()
+
+            # 如果是已知标签，直接返回
+            if word in self.spelling_index:
+                return word
+
+            # 在删除字典中查询有界编辑距离内的候选，跳过完全包含的情况（如"girl"和"girls"）
+            max_distance = min(self.spelling_index.fuzzy_index.max_distance, len(word) // 2)
+            with self.lock:
+                matches = self.spelling_index.find_similar(
+                    word,
+                    max_distance=max_distance,
+                    limit=1,
+                    exclude=lambda candidate: word in candidate or candidate in word)
+            if matches:
+                return matches[0][1]
+
+            return None
 
     def levenshtein_distance(self, s1, s2):
         """计算两个字符串的编辑距离"""
@@ -536,13 +3000,56 @@ class DanbooruScraper:
         return previous_row[-1]
 
 
+class LatestTaskWorker:
+    """在单个后台线程中执行任务，新任务提交后尚未开始的旧任务直接丢弃"""
+
+    def __init__(self, name="latest-task"):
+        self.condition = threading.Condition()
+        self.pending = None
+        self.generation = 0
+        threading.Thread(target=self.run, name=name, daemon=True).start()
+
+    def submit(self, func, args, callback):
+        """提交任务，返回本次任务的代号；callback(代号, 结果)在工作线程中调用"""
+        with self.condition:
+            self.generation += 1
+            self.pending = (self.generation, func, args, callback)
+            self.condition.notify()
+            return self.generation
+
+    def cancel(self):
+        """作废所有已提交的任务"""
+        with self.condition:
+            self.generation += 1
+            self.pending = None
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                generation, func, args, callback = self.pending
+                self.pending = None
+            try:
+                result = func(*args)
+            except Exception as e:
+                print(f"后台任务失败: {e}")
+                continue
+            if self.is_current(generation):
+                callback(generation, result)
+
+
 class SectionFrame(ttk.Frame):
-    def __init__(self, master, title, content, **kwargs):
+    def __init__(self, master, title='', content=None, **kwargs):
         super().__init__(master, **kwargs)
+        self.pending = None
         self.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
-        title_label = ttk.Label(self, text=title, font=('TkDefaultFont', 10))
-        title_label.pack(anchor='nw', padx=5, pady=(0, 5))
+        self.title_label = ttk.Label(self, text=title, font=('TkDefaultFont', 10))
+        self.title_label.pack(anchor='nw', padx=5, pady=(0, 5))
 
         text_frame = ttk.Frame(self, relief='sunken', borderwidth=1)
         text_frame.pack(fill=tk.BOTH, expand=True)
@@ -553,7 +3060,33 @@ class SectionFrame(ttk.Frame):
             height=8,
             font=('TkDefaultFont', 9))
         self.text_widget.pack(fill=tk.BOTH, expand=True, padx=1, pady=1)
-        self.text_widget.insert(tk.END, content)
+        if content is not None:
+            self.text_widget.insert(tk.END, content)
+        self.text_widget.config(state=tk.DISABLED)
+
+    def show(self, title, content):
+        """复用已有控件显示新章节，正文等滚动到附近时再填充"""
+        self.title_label.config(text=title)
+        self.pending = content
+        self.set_text('')
+        self.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+    def fill(self):
+        if self.pending is not None:
+            self.set_text(self.pending)
+            self.pending = None
+
+    def hide(self):
+        self.pending = None
+        self.set_text('')
+        self.pack_forget()
+
+    def set_text(self, content):
+        self.text_widget.config(state=tk.NORMAL)
+        self.text_widget.delete(1.0, tk.END)
+        if content:
+            self.text_widget.insert(tk.END, content)
+        self.text_widget.yview_moveto(0)
         self.text_widget.config(state=tk.DISABLED)
 
 
@@ -564,11 +3097,67 @@ class EasyDanTagApp:
         master.geometry(f"{WINDOW_WIDTH}x{WINDOW_HEIGHT}")
         master.resizable(False, True)
 
-        self.scraper = DanbooruScraper()
+        # 数据库在窗口显示后于后台加载，避免启动时卡住界面
+        self.scraper = DanbooruScraper(load_async=True)
+        self.scraper.start_revalidation()
+        self.scraper.start_identity_refresh()
         self.current_search = None
         self.search_timer_id = None
+        # 自动匹配在后台线程执行，只显示最新一次输入的结果
+        self.auto_search = LatestTaskWorker("auto-search")
+        self.load_start = None
+        self.first_paint_ms = None
+        self.switch_time = 0
         self.create_widgets()
-        self.master.after(100, self.check_queue)
+        self.master.after_idle(self.on_first_paint)
+        # 后台线程放入结果时通过虚拟事件唤醒界面线程，不再定时轮询
+        self.master.bind("<<ResultReady>>", self.on_result_ready)
+        self.scraper.queue.set_notify(lambda: self.master.event_generate("<<ResultReady>>", when="tail"))
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        # 先停止通知界面线程，再关闭事件循环；退出前把日志中的修改写入数据库，来不及写入的下次启动时恢复
+        self.scraper.queue.set_notify(None)
+        try:
+            self.scraper.close()
+        finally:
+            self.master.destroy()
+
+    def on_first_paint(self):
+        """窗口首次绘制完成后记录首屏用时并开始加载数据库"""
+        self.first_paint_ms = (time.perf_counter() - STARTUP_TIME) * 1000
+        print(f"首屏显示用时: {self.first_paint_ms:.0f} ms")
+        self.status_var.set("正在加载本地数据库...")
+        self.load_progress.pack(side=tk.BOTTOM, fill=tk.X)
+        self.load_start = time.perf_counter()
+        self.scraper.start_loading(self.report_load_progress, self.report_load_done)
+
+    def report_load_progress(self, loaded, total):
+        # 在加载线程中调用，通过队列交给界面线程
+        self.scraper.queue.put({'status': 'loading', 'loaded': loaded, 'total': total})
+
+    def report_load_done(self):
+        self.scraper.queue.put({
+            'status': 'loaded',
+            'total': len(self.scraper.tag_data),
+            'elapsed': time.perf_counter() - self.load_start
+        })
+
+    def process_load_result(self, result):
+        # 加载期间用户操作产生的状态信息优先显示，不被进度覆盖
+        loading = self.status_var.get().startswith("正在加载本地数据库")
+        if result['status'] == 'loading':
+            self.load_progress.config(maximum=max(result['total'], 1), value=result['loaded'])
+            if loading:
+                self.status_var.set(f"正在加载本地数据库: {result['loaded']}/{result['total']}")
+            return
+
+        self.load_progress.pack_forget()
+        message = (f"本地数据库加载完成: {result['total']} 条记录，用时 {result['elapsed']:.2f} 秒"
+                   f"（首屏 {self.first_paint_ms:.0f} ms）")
+        print(message)
+        if loading:
+            self.status_var.set(message)
 
 
 
@@ -621,7 +3210,9 @@ class EasyDanTagApp:
         )
 
         self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.configure(yscrollcommand=self.on_info_scroll)
+        # 窗口首次布局或改变大小后才能知道可见区域
+        self.canvas.bind("<Configure>", lambda e: self.fill_visible_sections())
 
         self.canvas.pack(side="left", fill="both", expand=True)
         self.scrollbar.pack(side="right", fill="y")
@@ -679,6 +3270,9 @@ class EasyDanTagApp:
 
         self.dynamic_frame = ttk.Frame(self.scrollable_frame)
         self.dynamic_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        # 章节控件在切换标签时复用，只有前section_count个处于显示状态
+        self.section_pool = []
+        self.section_count = 0
 
         meaning_trans_frame = ttk.LabelFrame(self.fixed_frame, text="释义翻译", padding=5)
         meaning_trans_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -696,6 +3290,28 @@ class EasyDanTagApp:
         self.db_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.db_tab, text="数据库搜索结果")
 
+        self.metrics_tab = ttk.Frame(self.notebook)
+        self.notebook.add(self.metrics_tab, text="性能统计")
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.metrics_refresh_id = None
+
+        metrics_toolbar = ttk.Frame(self.metrics_tab)
+        metrics_toolbar.pack(fill=tk.X, padx=5, pady=5)
+        self.metrics_enabled_var = tk.BooleanVar(value=metrics.enabled)
+        ttk.Checkbutton(metrics_toolbar, text="启用统计", variable=self.metrics_enabled_var,
+                        command=self.toggle_metrics).pack(side=tk.LEFT)
+        ttk.Button(metrics_toolbar, text="导出JSON", command=self.export_metrics).pack(side=tk.RIGHT)
+        ttk.Button(metrics_toolbar, text="重置", command=self.reset_metrics).pack(side=tk.RIGHT, padx=5)
+
+        # 耗时单位为毫秒，计数项只显示次数
+        metrics_columns = ("name", "count", "mean", "p50", "p99", "max")
+        self.metrics_tree = ttk.Treeview(self.metrics_tab, columns=metrics_columns, show="headings")
+        for column, text, width in zip(metrics_columns, ("项目", "次数", "平均", "p50", "p99", "最大"),
+                                       (190, 60, 70, 60, 60, 70)):
+            self.metrics_tree.heading(column, text=text)
+            self.metrics_tree.column(column, width=width, anchor=tk.W if column == "name" else tk.E)
+        self.metrics_tree.pack(fill=tk.BOTH, expand=True)
+
         columns = ("tag", "tag_translation")
         self.db_tree = ttk.Treeview(self.db_tab, columns=columns, show="headings")
 
@@ -705,21 +3321,31 @@ class EasyDanTagApp:
         self.db_tree.column("tag", width=300)
         self.db_tree.column("tag_translation", width=400)
 
-        scrollbar = ttk.Scrollbar(self.db_tab, orient="vertical", command=self.db_tree.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.db_tree.configure(yscrollcommand=scrollbar.set)
+        # 结果列表只生成可见范围内的行，滚动条按完整结果数换算位置
+        self.db_rows = []
+        self.db_offset = 0
+        self.db_selected = None
+        self.db_online_query = None
+        self.db_scrollbar = ttk.Scrollbar(self.db_tab, orient="vertical", command=self.on_db_scroll)
+        self.db_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         self.db_tree.pack(fill=tk.BOTH, expand=True)
         self.db_tree.bind("<Double-1>", self.on_db_double_click)
         self.db_tree.bind("<Return>", self.on_db_double_click)
-        self.db_tree.bind("<Up>", self.on_db_navigate)
-        self.db_tree.bind("<Down>", self.on_db_navigate)
+        for key in ("<Up>", "<Down>", "<Prior>", "<Next>", "<Home>", "<End>"):
+            self.db_tree.bind(key, self.on_db_navigate)
+        self.db_tree.bind("<<TreeviewSelect>>", self.on_db_select)
+        self.db_tree.bind("<MouseWheel>", self.on_db_mousewheel)
+        self.db_tree.bind("<Button-4>", self.on_db_mousewheel)
+        self.db_tree.bind("<Button-5>", self.on_db_mousewheel)
+        self.db_tree.bind("<Configure>", lambda event: self.render_db_rows())
 
         self.status_var = tk.StringVar(value="就绪")
         status_bar = ttk.Label(self.master, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
         self.progress = ttk.Progressbar(self.master, mode='indeterminate', length=300)
+        self.load_progress = ttk.Progressbar(self.master, mode='determinate', length=300)
 
     def copy_tag_to_clipboard(self, event):
         tag = self.tag_label.cget("text")
@@ -742,6 +3368,17 @@ class EasyDanTagApp:
             messagebox.showwarning("输入错误", "请输入标签")
             return
 
+        # 丢弃尚未返回的自动匹配结果，避免覆盖本次搜索
+        if self.search_timer_id:
+            self.master.after_cancel(self.search_timer_id)
+            self.search_timer_id = None
+        self.auto_search.cancel()
+
+        # 输入逗号分隔的提示词时按批量查询处理
+        if ',' in query:
+            self.start_batch_search(query)
+            return
+
         local_results = self.scraper.search_db(query)
         normalized_query = query.replace(' ', '_')
 
@@ -755,11 +3392,8 @@ class EasyDanTagApp:
             self.show_db_results(local_results, query)
             self.notebook.select(self.db_tab)
 
-            if self.db_tree.get_children():
-                first_item = self.db_tree.get_children()[0]
-                self.db_tree.selection_set(first_item)
-                self.db_tree.focus(first_item)
-                self.db_tree.see(first_item)
+            if self.db_rows:
+                self.select_db_row(0)
                 self.db_tree.focus_set()
         else:
             self.search_button.config(state=tk.DISABLED)
@@ -769,27 +3403,142 @@ class EasyDanTagApp:
             self.status_var.set(f"正在在线获取标签信息: {query}...")
             self.current_search = query
 
-            threading.Thread(
-                target=self.scraper.get_tag_info,
-                args=(query,),
-                daemon=True
-            ).start()
+            self.scraper.submit_tag_info(query)
 
-    def show_db_results(self, results, query):
-        for item in self.db_tree.get_children():
-            self.db_tree.delete(item)
+    def start_batch_search(self, text):
+        tags = self.scraper.parse_prompt_tags(text)
+        if not tags:
+            messagebox.showwarning("输入错误", "请输入标签")
+            return
 
-        # 添加在线搜索项作为第一项
-        self.db_tree.insert("", tk.END, iid="online_search", values=(f"在线搜索：{query}", ""))
+        self.set_db_rows([])
+        self.notebook.select(self.db_tab)
 
-        # 添加本地匹配结果
-        for i, result in enumerate(results):
-            self.db_tree.insert("", tk.END, iid=i, values=(
-                result['tag'],
-                result.get('tag_translation', '')
-            ))
+        self.search_button.config(state=tk.DISABLED)
+        self.progress.pack(side=tk.BOTTOM, fill=tk.X)
+        self.progress.start(10)
+        self.status_var.set(f"正在批量查询 {len(tags)} 个标签...")
+        self.scraper.get_tags_info(tags)
+
+    def process_batch_item(self, result):
+        item = result['item']
+        if item['status'] == 'success':
+            data = item['result']
+            values = (data['tag'], data.get('tag_translation', ''))
+        else:
+            values = (result['tag'].replace(' ', '_'), "（未找到）")
+        self.db_rows.append(values)
+        self.render_db_rows()
+        self.status_var.set(f"批量查询中: {result['done']}/{result['total']}")
+
+    def show_db_results(self, results, query):
+        # 添加在线搜索项作为第一项，其后是本地匹配结果
+        self.set_db_rows([(f"在线搜索：{query}", "")] + list(results), online_query=query)
+
+    def set_db_rows(self, rows, online_query=None):
+        """替换结果列表；行可以是标签记录或(标签, 翻译)元组"""
+        self.db_rows = rows
+        self.db_offset = 0
+        self.db_selected = None
+        self.db_online_query = online_query
+        self.render_db_rows()
+
+    def db_row_values(self, row):
+        if isinstance(row, tuple):
+            return row
+        return (row['tag'], row.get('tag_translation', ''))
+
+    def db_visible_rows(self):
+        # 由首行的实际位置和行高推算可见行数
+        children = self.db_tree.get_children()
+        if children:
+            box = self.db_tree.bbox(children[0])
+            if box:
+                return max(1, (self.db_tree.winfo_height() - box[1]) // box[3])
+        return DB_VISIBLE_ROWS
+
+    def render_db_rows(self):
+        """重新生成可见窗口内的行，行ID即结果序号"""
+        visible = self.db_visible_rows()
+        total = len(self.db_rows)
+        self.db_offset = max(0, min(self.db_offset, total - visible))
+        end = min(total, self.db_offset + visible + DB_ROW_BUFFER)
+
+        self.db_tree.delete(*self.db_tree.get_children())
+        for index in range(self.db_offset, end):
+            self.db_tree.insert("", tk.END, iid=str(index), values=self.db_row_values(self.db_rows[index]))
+        self.db_tree.yview_moveto(0)
+
+        if self.db_selected is not None and self.db_offset <= self.db_selected < end:
+            self.db_tree.selection_set(str(self.db_selected))
+            self.db_tree.focus(str(self.db_selected))
+
+        if total:
+            self.db_scrollbar.set(self.db_offset / total, min(1.0, (self.db_offset + visible) / total))
+        else:
+            self.db_scrollbar.set(0, 1)
+        self.notebook.tab(self.db_tab, text=f"数据库搜索结果（{total}）" if total else "数据库搜索结果")
+
+    def scroll_db_to(self, offset):
+        offset = max(0, min(offset, len(self.db_rows) - self.db_visible_rows()))
+        if offset != self.db_offset:
+            self.db_offset = offset
+            self.render_db_rows()
+
+    def select_db_row(self, index):
+        """选中指定序号的行，必要时滚动到该行"""
+        if not self.db_rows:
+            return
+        index = max(0, min(index, len(self.db_rows) - 1))
+        visible = self.db_visible_rows()
+        self.db_selected = index
+        if index < self.db_offset:
+            self.db_offset = index
+        elif index >= self.db_offset + visible:
+            self.db_offset = index - visible + 1
+        self.render_db_rows()
+
+    def on_db_scroll(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_db_to(int(float(args[1]) * len(self.db_rows)))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.db_visible_rows()
+            self.scroll_db_to(self.db_offset + step)
+
+    def on_db_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_db_to(self.db_offset - 3)
+        else:
+            self.scroll_db_to(self.db_offset + 3)
+        return "break"
+
+    def on_db_select(self, event):
+        selected = self.db_tree.selection()
+        if selected:
+            self.db_selected = int(selected[0])
 
     def process_search_result(self, result):
+        if result['status'] in ('loading', 'loaded'):
+            self.process_load_result(result)
+            return
+
+        if result['status'] == 'autocomplete':
+            self.show_auto_search_results(result)
+            return
+
+        if result['status'] == 'batch_item':
+            self.process_batch_item(result)
+            return
+
+        if result['status'] == 'batch_done':
+            self.progress.stop()
+            self.progress.pack_forget()
+            self.search_button.config(state=tk.NORMAL)
+            self.status_var.set(f"批量查询完成: 共 {result['total']} 个标签，失败 {result['failed']} 个")
+            return
+
         self.progress.stop()
         self.progress.pack_forget()
         self.search_button.config(state=tk.NORMAL)
@@ -917,8 +3666,10 @@ class EasyDanTagApp:
         self.master.focus_set()
 
     def display_tag_info(self, tag_info):
-        for widget in self.dynamic_frame.winfo_children():
-            widget.destroy()
+        start = time.perf_counter()
+        if isinstance(tag_info, TagRecord):
+            # 一次读出正文，避免逐个字段查询数据库
+            tag_info = tag_info.to_dict()
 
         self.tag_label.config(text=tag_info['tag'])
 
@@ -942,12 +3693,33 @@ class EasyDanTagApp:
         self.meaning_translation_text.delete(1.0, tk.END)
         self.meaning_translation_text.insert(tk.END, tag_info.get('meaning_translation', ''))
 
-        for section_title, section_content in tag_info.get('sections', {}).items():
-            SectionFrame(
-                self.dynamic_frame,
-                title=section_title,
-                content=section_content
-            )
+        sections = list(tag_info.get('sections', {}).items())
+        while len(self.section_pool) < len(sections):
+            self.section_pool.append(SectionFrame(self.dynamic_frame))
+        for frame, (section_title, section_content) in zip(self.section_pool, sections):
+            frame.show(section_title, section_content)
+        for frame in self.section_pool[len(sections):self.section_count]:
+            frame.hide()
+        self.section_count = len(sections)
+
+        # 布局完成后只填充可见区域附近的章节
+        self.master.after_idle(self.fill_visible_sections)
+        self.switch_time = time.perf_counter() - start
+        metrics.observe('ui.display_tag', self.switch_time)
+
+    def on_info_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.fill_visible_sections()
+
+    def fill_visible_sections(self):
+        # 尚未完成布局时高度为1，所有章节都会被当作可见，等<Configure>事件再填充
+        if self.canvas.winfo_height() <= 1:
+            return
+        bottom = self.canvas.canvasy(self.canvas.winfo_height()) + SECTION_PRELOAD_MARGIN
+        offset = self.dynamic_frame.winfo_y()
+        for frame in self.section_pool[:self.section_count]:
+            if frame.pending is not None and offset + frame.winfo_y() < bottom:
+                frame.fill()
 
     def on_search_key_release(self, event):
         if self.search_timer_id:
@@ -955,22 +3727,28 @@ class EasyDanTagApp:
         self.search_timer_id = self.master.after(100, self.perform_auto_search)
 
     def perform_auto_search(self):
+        self.search_timer_id = None
         query = self.search_entry.get().strip()
         if not query:
+            self.auto_search.cancel()
             return
 
-        results = self.scraper.search_db(query)
-        for item in self.db_tree.get_children():
-            self.db_tree.delete(item)
+        self.auto_search.submit(self.scraper.autocomplete, (query,), self.report_auto_search)
 
-        for i, result in enumerate(results):
-            self.db_tree.insert("", tk.END, iid=i, values=(
-                result['tag'],
-                result.get('tag_translation', '')
-            ))
+    def report_auto_search(self, generation, results):
+        # 在工作线程中调用，通过队列交给界面线程
+        self.scraper.queue.put({'status': 'autocomplete', 'generation': generation, 'results': results})
+
+    def show_auto_search_results(self, result):
+        # 结果返回前又有新的输入或搜索时丢弃
+        if not self.auto_search.is_current(result['generation']):
+            return
+
+        results = result['results']
+        self.set_db_rows(results)
 
         if results:
-            self.status_var.set(f"找到 {len(results)} 条匹配记录（自动匹配）")
+            self.status_var.set(f"找到 {len(results)} 条匹配记录（自动匹配，按作品数排序）")
         else:
             self.status_var.set("未找到匹配记录（自动匹配）")
 
@@ -979,12 +3757,11 @@ class EasyDanTagApp:
         if not selected:
             return
 
-        item_id = selected[0]
-        item = self.db_tree.item(item_id)
+        index = int(selected[0])
 
         # 检查是否是"在线搜索"项
-        if item_id == "online_search":
-            query = item['values'][0].split("：")[1]
+        if index == 0 and self.db_online_query is not None:
+            query = self.db_online_query
             if not self.scraper.is_valid_tag(query):
                 messagebox.showwarning("无效标签", f"'{query}' 不是有效的标签格式")
                 return
@@ -995,42 +3772,33 @@ class EasyDanTagApp:
             self.status_var.set(f"正在在线获取标签信息: {query}...")
             self.current_search = query
 
-            threading.Thread(
-                target=self.scraper.get_tag_info,
-                args=(query,),
-                daemon=True
-            ).start()
+            self.scraper.submit_tag_info(query)
         else:
-            tag = item['values'][0]
-            normalized_tag = tag.replace(' ', '_')
-            if normalized_tag in self.scraper.tag_data:
+            tag = self.db_row_values(self.db_rows[index])[0]
+            record = self.scraper.get_record(tag.replace(' ', '_'))
+            if record is not None:
                 self.notebook.select(self.info_tab)
-                self.display_tag_info(self.scraper.tag_data[normalized_tag])
+                self.display_tag_info(record)
                 self.save_button.config(state=tk.NORMAL)
                 self.info_tab.focus_set()
 
     def on_db_navigate(self, event):
-        current_selection = self.db_tree.selection()
-        if not current_selection:
+        if self.db_selected is None:
             return
 
-        current_item = current_selection[0]
-        children = self.db_tree.get_children()
-
-        if event.keysym == "Up":
-            index = children.index(current_item)
-            if index > 0:
-                new_item = children[index - 1]
-                self.db_tree.selection_set(new_item)
-                self.db_tree.focus(new_item)
-                self.db_tree.see(new_item)
-        elif event.keysym == "Down":
-            index = children.index(current_item)
-            if index < len(children) - 1:
-                new_item = children[index + 1]
-                self.db_tree.selection_set(new_item)
-                self.db_tree.focus(new_item)
-                self.db_tree.see(new_item)
+        # 按完整结果列表中的序号移动，超出可见窗口时翻页
+        steps = {
+            "Up": -1,
+            "Down": 1,
+            "Prior": -self.db_visible_rows(),
+            "Next": self.db_visible_rows()
+        }
+        if event.keysym == "Home":
+            self.select_db_row(0)
+        elif event.keysym == "End":
+            self.select_db_row(len(self.db_rows) - 1)
+        else:
+            self.select_db_row(self.db_selected + steps[event.keysym])
         return "break"
 
     def save_translation(self):
@@ -1050,17 +3818,201 @@ class EasyDanTagApp:
             self.status_var.set("保存翻译失败")
             messagebox.showerror("错误", "保存翻译失败")
 
-    def check_queue(self):
+    def on_result_ready(self, event=None):
+        results = self.scraper.queue.drain()
+        metrics.observe('ui.delivery', self.scraper.queue.delivery_latency)
+        for result in results:
+            self.process_search_result(result)
+
+    def toggle_metrics(self):
+        metrics.enabled = self.metrics_enabled_var.get()
+        self.refresh_metrics()
+
+    def reset_metrics(self):
+        metrics.reset()
+        self.refresh_metrics()
+
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(
+            title="导出性能统计", defaultextension=".json", initialfile="metrics.json",
+            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            metrics.dump(path)
+            self.status_var.set(f"性能统计已导出到: {path}")
+        except OSError as e:
+            messagebox.showerror("错误", f"导出失败: {e}")
+
+    def on_tab_changed(self, event=None):
+        if self.notebook.select() == str(self.metrics_tab):
+            self.refresh_metrics()
+
+    def refresh_metrics(self):
+        """更新性能统计表格；页面可见时定时刷新"""
+        if self.metrics_refresh_id:
+            self.master.after_cancel(self.metrics_refresh_id)
+            self.metrics_refresh_id = None
+        if self.notebook.select() != str(self.metrics_tab):
+            return
+
+        snapshot = metrics.snapshot()
+        self.metrics_tree.delete(*self.metrics_tree.get_children())
+        for name, timing in snapshot['timings'].items():
+            self.metrics_tree.insert("", tk.END, values=(
+                name, timing['count'], f"{timing['mean_ms']:.2f}", f"{timing['p50_ms']:g}",
+                f"{timing['p99_ms']:g}", f"{timing['max_ms']:.2f}"))
+        for name, count in snapshot['counters'].items():
+            self.metrics_tree.insert("", tk.END, values=(name, count, "", "", "", ""))
+        self.metrics_refresh_id = self.master.after(METRICS_REFRESH_INTERVAL, self.refresh_metrics)
+
+
+class TagServiceHandler(BaseHTTPRequestHandler):
+    """无界面服务模式的JSON接口，所有请求线程共用同一个DanbooruScraper"""
+
+    scraper = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def tag_summary(self, record):
+        return {field: record.get(field) for field in ('tag', 'tag_translation', 'synonyms', 'posts')}
+
+    def tag_detail(self, tag_info):
+        # 缓存命中时是TagRecord，新抓取时是带预取链接的字典，只返回持久化的字段
+        if isinstance(tag_info, TagRecord):
+            return tag_info.to_dict()
+        return {field: tag_info.get(field) for field in TagRecord.FIELDS}
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {name: values[0] for name, values in parse_qs(parts.query).items()}
+        handler = {
+            '/lookup': self.handle_lookup,
+            '/search': self.handle_search,
+            '/suggest': self.handle_suggest,
+            '/metrics': self.handle_metrics
+        }.get(parts.path)
+        if handler is None:
+            self.send_json(404, {'status': 'error', 'message': f"未知接口: {parts.path}"})
+            return
+        try:
+            status, data = handler(params)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        except Exception as e:
+            status, data = 500, {'status': 'error', 'message': str(e)}
         try:
-            while not self.scraper.queue.empty():
-                result = self.scraper.queue.get_nowait()
-                self.process_search_result(result)
-        except queue.Empty:
+            self.send_json(status, data)
+        except (BrokenPipeError, ConnectionResetError):
             pass
-        self.master.after(100, self.check_queue)
+
+    def require_tag(self, params):
+        # 标签可以含有括号和撇号（如 saber_(fate)），只拒绝空值和过长的输入，请求时再转义
+        tag = params.get('tag', '').strip().replace(' ', '_')
+        if not tag or len(tag) > SERVE_MAX_TAG_LENGTH:
+            return None
+        return tag
+
+    def handle_lookup(self, params):
+        """查询标签，本地没有时在线获取"""
+        tag = self.require_tag(params)
+        if tag is None:
+            return 400, {'status': 'error', 'message': "缺少参数tag或标签过长"}
+        result = dict(self.scraper.lookup_tag(tag))
+        if 'result' in result:
+            result['result'] = self.tag_detail(result['result'])
+        return 200, result
+
+    def handle_search(self, params):
+        query = params.get('q', '').strip()
+        if not query:
+            return 400, {'status': 'error', 'message': "缺少参数q"}
+        try:
+            limit = max(int(params.get('limit', SERVE_SEARCH_LIMIT)), 1)
+        except ValueError:
+            return 400, {'status': 'error', 'message': "limit必须是整数"}
+        results = self.scraper.search_db(query, limit)
+        return 200, {'status': 'success', 'query': query, 'results': [self.tag_summary(r) for r in results]}
+
+    def handle_suggest(self, params):
+        """返回本地最接近的标签和建议链接"""
+        tag = self.require_tag(params)
+        if tag is None:
+            return 400, {'status': 'error', 'message': "缺少参数tag或标签过长"}
+        return 200, {
+            'status': 'success',
+            'tag': tag,
+            'match': self.scraper.find_closest_match(tag),
+            'suggestion_url': self.scraper.generate_suggestion_url(tag)
+        }
+
+    def handle_metrics(self, params):
+        return 200, metrics.snapshot()
+
+
+def import_main(path, batch_size):
+    scraper = DanbooruScraper(load_async=True)
+    scraper.migrate_data()
+
+    def progress(counts):
+        print(f"\r已导入: 新增 {counts['added']}，更新 {counts['updated']}，跳过 {counts['skipped']}",
+              end='', flush=True)
+
+    start = time.perf_counter()
+    counts = scraper.import_tags(path, progress, batch_size)
+    print(f"\n导入完成，用时 {time.perf_counter() - start:.1f} 秒，数据库共 {scraper.store.count()} 条记录")
+    scraper.close()
+    return counts
+
+
+def serve_main(host, port):
+    """不启动界面，以HTTP接口提供查询、搜索和拼写建议"""
+    scraper = DanbooruScraper(load_async=True)
+    scraper.start_revalidation()
+    scraper.start_identity_refresh()
+    # 加载期间的搜索直接读数据库，服务无需等待加载完成
+    load_start = time.perf_counter()
+    scraper.start_loading(done=lambda: print(
+        f"本地数据库加载完成: {len(scraper.tag_data)} 条记录，用时 {time.perf_counter() - load_start:.1f} 秒"))
+
+    handler = type('TagServiceHandler', (TagServiceHandler,), {'scraper': scraper})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"服务已启动: http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        scraper.close()
+        with scraper.store.lock:
+            scraper.store.conn.close()
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = EasyDanTagApp(root)
-    root.mainloop()
+    parser = argparse.ArgumentParser(description="EasyDanTag")
+    parser.add_argument('--import', dest='import_file', metavar='PATH',
+                        help="导入CSV或JSON Lines格式的标签导出文件后退出")
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help="导入时每批写入的行数")
+    parser.add_argument('--serve', action='store_true', help="不启动界面，以HTTP接口提供查询服务")
+    parser.add_argument('--host', default=SERVE_HOST, help="服务模式监听的地址")
+    parser.add_argument('--port', type=int, default=SERVE_PORT, help="服务模式监听的端口")
+    args = parser.parse_args()
+
+    if args.import_file:
+        import_main(args.import_file, args.batch_size)
+    elif args.serve:
+        serve_main(args.host, args.port)
+    else:
+        root = tk.Tk()
+        app = EasyDanTagApp(root)
+        root.mainloop()
@@ -0,0 +1,205 @@
+# mock_server.py
+# 本地模拟Danbooru站点，回放 fixtures 目录中录制的响应，用于离线测试抓取流程
+# 可以注入延迟、404、429限流和Cloudflare验证页面，用于压力测试
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote, quote
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+CHALLENGE_PAGE = (b'<!DOCTYPE html><html><head><title>Just a moment...</title></head>'
+                  b'<body><p>Checking your browser before accessing the site.</p>'
+                  b'<p>Performance &amp; security by Cloudflare</p></body></html>')
+
+
+class FaultInjector:
+    """按比例为请求注入故障，各比例在0到1之间"""
+
+    def __init__(self, latency=0.0, jitter=0.0, not_found_rate=0.0, rate_limit_rate=0.0,
+                 challenge_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.not_found_rate = not_found_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.challenge_rate = challenge_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def delay(self):
+        with self.lock:
+            return max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0)
+
+    def choose(self):
+        """返回本次请求的故障类型，不注入时返回None"""
+        with self.lock:
+            roll = self.random.random()
+            fault = None
+            for name, rate in (('rate_limit', self.rate_limit_rate), ('challenge', self.challenge_rate),
+                               ('not_found', self.not_found_rate)):
+                if roll < rate:
+                    fault = name
+                    break
+                roll -= rate
+            key = fault or 'ok'
+            self.counts[key] = self.counts.get(key, 0) + 1
+            return fault
+
+
+class MockDanbooruHandler(BaseHTTPRequestHandler):
+    fixture_dir = FIXTURE_DIR
+    faults = None
+    replay_any = False  # 没有录制的标签按名称散列回放某个已录制的页面
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # 注入的延迟超过客户端超时时，客户端会先断开连接
+            pass
+
+    def read_fixture(self, folder, name):
+        # 文件名与标签一一对应，特殊字符按URL编码保存
+        path = os.path.join(self.fixture_dir, folder, quote(name, safe=''))
+        if not os.path.exists(path) and self.replay_any:
+            path = self.substitute_fixture(folder, name)
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def substitute_fixture(self, folder, name):
+        ext = os.path.splitext(name)[1]
+        names = sorted(n for n in os.listdir(os.path.join(self.fixture_dir, folder)) if n.endswith(ext))
+        if not names:
+            return None
+        index = int(hashlib.md5(name.encode('utf-8')).hexdigest(), 16) % len(names)
+        return os.path.join(self.fixture_dir, folder, names[index])
+
+    def inject_fault(self):
+        """按设置延迟响应或返回故障页面，已经发送响应时返回True"""
+        faults = self.faults
+        if faults is None:
+            return False
+        delay = faults.delay()
+        if delay:
+            time.sleep(delay)
+        fault = faults.choose()
+        if fault == 'rate_limit':
+            body = b'Too Many Requests'
+            self.send_response(429)
+            self.send_header('Retry-After', str(faults.retry_after))
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return True
+        if fault == 'challenge':
+            self.send_body(403, CHALLENGE_PAGE, 'text/html; charset=utf-8')
+            return True
+        if fault == 'not_found':
+            self.send_body(404, b'Not Found', 'text/plain; charset=utf-8')
+            return True
+        return False
+
+    def send_body(self, status, body, content_type):
+        etag = None
+        if status == 200:
+            # 支持条件请求，内容未变时返回304
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+
+        if self.inject_fault():
+            return
+
+        if path == '/tags.json':
+            name = parse_qs(parts.query).get('search[name]', [''])[0]
+            body = self.read_fixture('tags', f'{name}.json')
+            # 与真实接口一致，没有匹配时返回空列表
+            self.send_body(200, body or b'[]', 'application/json; charset=utf-8')
+            return
+
+        if path.startswith('/wiki_pages/'):
+            name = path[len('/wiki_pages/'):]
+            if name.endswith('.json'):
+                body = self.read_fixture('wiki_pages', name)
+                content_type = 'application/json; charset=utf-8'
+            else:
+                body = self.read_fixture('wiki_pages', f'{name}.html')
+                content_type = 'text/html; charset=utf-8'
+            if body is not None:
+                self.send_body(200, body, content_type)
+                return
+
+        self.send_body(404, b'Not Found', 'text/plain; charset=utf-8')
+
+
+def make_handler(fixture_dir=None, faults=None, replay_any=False):
+    return type('MockDanbooruHandler', (MockDanbooruHandler,), {
+        'fixture_dir': fixture_dir or FIXTURE_DIR,
+        'faults': faults,
+        'replay_any': replay_any
+    })
+
+
+def start_server(host='127.0.0.1', port=0, fixture_dir=None, faults=None, replay_any=False):
+    """在后台线程中启动模拟服务器，返回服务器对象和基础URL"""
+    server = ThreadingHTTPServer((host, port), make_handler(fixture_dir, faults, replay_any))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制响应的本地Danbooru模拟服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', default=FIXTURE_DIR, help="录制响应所在目录")
+    parser.add_argument('--replay-any', action='store_true', help="没有录制的标签回放任意已录制的页面")
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求的延迟秒数")
+    parser.add_argument('--jitter', type=float, default=0.0, help="延迟的随机浮动秒数")
+    parser.add_argument('--not-found-rate', type=float, default=0.0, help="返回404的比例")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="返回429的比例")
+    parser.add_argument('--challenge-rate', type=float, default=0.0, help="返回Cloudflare验证页面的比例")
+    parser.add_argument('--seed', type=int, help="故障注入的随机种子")
+    args = parser.parse_args()
+
+    faults = FaultInjector(args.latency, args.jitter, args.not_found_rate, args.rate_limit_rate,
+                           args.challenge_rate, seed=args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.fixtures, faults, args.replay_any))
+    print(f"模拟服务器已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()